@@ -0,0 +1,209 @@
+"""Local stand-in for an OpenAI-compatible chat-completions endpoint.
+
+Answers POST /v1/chat/completions with a made-up translation in square
+brackets, after a latency drawn from a configurable distribution, and
+rejects a configurable share of requests with 429 Too Many Requests. Nothing
+leaves the machine, so runs are free and reproducible (given --seed).
+
+    python benchmarks/mock_server.py --port 8000 --latency lognormal:0.4,0.5 --rate-429 0.05
+
+Point the pipeline at it with base_url = "http://127.0.0.1:8000/v1" in [engine].
+"""
+import argparse
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WORDS = ("the", "people", "land", "water", "light", "house", "road", "word", "said", "came",
+         "went", "saw", "gave", "great", "small", "good", "many", "day", "night", "child")
+
+def parse_latency(spec):
+    """Build a sampler from 'constant:S', 'uniform:LOW,HIGH' or 'lognormal:MEDIAN,SIGMA' (seconds)"""
+    kind, _, args = spec.partition(':')
+    values = [float(v) for v in args.split(',')] if args else []
+    if kind == 'constant' and len(values) == 1:
+        return lambda rng: values[0]
+    if kind == 'uniform' and len(values) == 2:
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == 'lognormal' and len(values) == 2:
+        return lambda rng: rng.lognormvariate(math.log(values[0]), values[1])
+    raise ValueError(f"Bad latency '{spec}': use constant:S, uniform:LOW,HIGH or lognormal:MEDIAN,SIGMA")
+
+class MockSettings:
+    """Behaviour of the mock server, shared by every request handler"""
+
+    def __init__(self, latency="constant:0.2", rate_429=0.0, retry_after=1, response_words=12,
+                 response_words_spread=0.5, seed=0, trailing_words=0, token_delay=0.0):
+        self.latency = parse_latency(latency)
+        self.rate_429 = rate_429
+        self.retry_after = retry_after
+        self.response_words = response_words
+        self.response_words_spread = response_words_spread
+        # Chatter after the closing bracket, as verbose models produce, and the time per streamed word
+        self.trailing_words = trailing_words
+        self.token_delay = token_delay
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats = {'requests': 0, 'completed': 0, 'rejected_429': 0}
+
+    def draw(self):
+        """Latency, whether to reject, and response length for one request"""
+        with self.lock:
+            self.stats['requests'] += 1
+            latency = self.latency(self.rng)
+            reject = self.rng.random() < self.rate_429
+            spread = self.response_words * self.response_words_spread
+            words = max(1, int(round(self.rng.uniform(self.response_words - spread, self.response_words + spread))))
+            self.stats['rejected_429' if reject else 'completed'] += 1
+        return max(latency, 0.0), reject, words
+
+def make_translation(prompt, words):
+    """Deterministic filler text: the same prompt always gets the same translation"""
+    seed = int(hashlib.sha1(prompt.encode('utf-8')).hexdigest()[:8], 16)
+    rng = random.Random(seed)
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        # One log line per request would swamp the benchmark output
+        pass
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _stream(self, request, content):
+        """Send the content as server-sent events, one word per chunk"""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        words = content.split(" ")
+        try:
+            for n, word in enumerate(words):
+                delta = word if n == 0 else " " + word
+                self._send_event({
+                    "id": "chatcmpl-mock-stream",
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": request.get("model", "mock"),
+                    "choices": [{"index": 0, "delta": {"content": delta}, "finish_reason": None}]
+                })
+                time.sleep(self.server.settings.token_delay)
+            self._send_chunk(b"data: [DONE]\n\n")
+            self._send_chunk(b"")
+        except (BrokenPipeError, ConnectionResetError):
+            # The client closed the stream early, which is what a cut-off looks like from here
+            with self.server.settings.lock:
+                self.server.settings.stats['streams_cut_off'] = self.server.settings.stats.get('streams_cut_off', 0) + 1
+            self.close_connection = True
+
+    def _send_event(self, payload):
+        self._send_chunk(f"data: {json.dumps(payload)}\n\n".encode('utf-8'))
+
+    def _send_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b"\r\n")
+        self.wfile.flush()
+
+    def do_GET(self):
+        if self.path.rstrip('/').endswith('/models'):
+            self._send_json(200, {"object": "list", "data": [{"id": "mock", "object": "model"}]})
+        elif self.path.rstrip('/').endswith('/stats'):
+            self._send_json(200, self.server.settings.stats)
+        else:
+            self._send_json(404, {"error": {"message": "not found"}})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self._send_json(404, {"error": {"message": "not found"}})
+            return
+
+        latency, reject, words = self.server.settings.draw()
+        time.sleep(latency)
+        if reject:
+            self._send_json(429, {"error": {"message": "Too Many Requests", "type": "rate_limit_exceeded"}},
+                            headers={"Retry-After": str(self.server.settings.retry_after)})
+            return
+
+        prompt = "".join(str(m.get("content", "")) for m in request.get("messages", []))
+        content = f"[{make_translation(prompt, words)}]"
+        settings = self.server.settings
+        if settings.trailing_words:
+            content += " " + make_translation(prompt[::-1], settings.trailing_words)
+        if request.get("stream"):
+            self._stream(request, content)
+            return
+        self._send_json(200, {
+            "id": f"chatcmpl-mock-{self.server.settings.stats['requests']}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "mock"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop"
+            }],
+            "usage": {
+                "prompt_tokens": len(prompt.split()),
+                "completion_tokens": words + 2,
+                "total_tokens": len(prompt.split()) + words + 2
+            }
+        })
+
+def start_server(settings, host="127.0.0.1", port=0):
+    """Serve in a background thread; returns the server (its port is server.server_address[1])"""
+    server = ThreadingHTTPServer((host, port), MockHandler)
+    server.daemon_threads = True
+    server.settings = settings
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def add_server_arguments(parser):
+    """Mock behaviour options, shared with the benchmark runner"""
+    parser.add_argument('--latency', default="lognormal:0.3,0.4",
+                        help="per-request latency: constant:S, uniform:LOW,HIGH or lognormal:MEDIAN,SIGMA (default: lognormal:0.3,0.4)")
+    parser.add_argument('--rate-429', type=float, default=0.0, help="share of requests rejected with 429 (default: 0)")
+    parser.add_argument('--retry-after', type=int, default=1, help="Retry-After seconds sent with a 429 (default: 1)")
+    parser.add_argument('--response-words', type=int, default=12, help="mean words per translation (default: 12)")
+    parser.add_argument('--trailing-words', type=int, default=0,
+                        help="words of chatter after the closing bracket, like a verbose model (default: 0)")
+    parser.add_argument('--token-delay', type=float, default=0.0,
+                        help="seconds between streamed words (default: 0)")
+    parser.add_argument('--seed', type=int, default=0, help="random seed for latencies and rejections")
+
+def settings_from_args(args):
+    return MockSettings(latency=args.latency, rate_429=args.rate_429, retry_after=args.retry_after,
+                        response_words=args.response_words, seed=args.seed,
+                        trailing_words=args.trailing_words, token_delay=args.token_delay)
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock OpenAI-compatible chat-completions server")
+    parser.add_argument('--host', default="127.0.0.1")
+    parser.add_argument('--port', type=int, default=8000)
+    add_server_arguments(parser)
+    args = parser.parse_args()
+
+    server = start_server(settings_from_args(args), args.host, args.port)
+    print(f"Mock server listening on http://{args.host}:{server.server_address[1]}/v1 (Ctrl+C to stop)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+        print(f"\nServed {server.settings.stats}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""End-to-end throughput benchmark of main.py against the local mock server.
+
+Generates synthetic language-pair files, starts the mock chat-completions
+server in-process, and runs main.py's translate, score and report stages
+as separate commands in a scratch directory with its own pipeline.toml.
+Reports wall-clock and sentences per second per stage, plus request
+latency percentiles and retries from the run's metrics.json. Sentences are
+counted from what each stage recorded in metrics.json, and a stage that got
+through fewer than all of them fails the benchmark.
+
+    python benchmarks/run_benchmark.py --rows 500 --models 3 --latency lognormal:0.3,0.4 --rate-429 0.05
+
+The score stage loads the configured sentence-transformers model, so it
+needs that model available locally (or leave it out with --stages translate).
+Nothing is sent to the real API and the translation cache is disabled, so
+every run does the same work.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from mock_server import WORDS, add_server_arguments, settings_from_args, start_server
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+STAGES = ["translate", "score", "report"]
+
+# Name each stage records its rows under in stage_rows_total
+STAGE_METRICS = {"translate": "translation", "score": "similarity"}
+
+def write_inputs(input_dir, pairs, rows, seed):
+    """One 'source-target.csv' per pair with synthetic text and references"""
+    import pandas as pd
+    rng = random.Random(seed)
+    os.makedirs(input_dir, exist_ok=True)
+    for pair in pairs:
+        sentences = [" ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 24))) for _ in range(rows)]
+        references = [" ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 24))) for _ in range(rows)]
+        pd.DataFrame({'text': sentences, 'ref': references}).to_csv(os.path.join(input_dir, f"{pair}.csv"), index=False)
+
+def write_config(path, base_url, args):
+    """pipeline.toml for the scratch run: mock endpoint, no cache, generous rate limits"""
+    recipes = "\n".join(
+        f'[recipes."mock-{n}"]\nengine = "nvidia"\nmodel = "mock/model-{n}"\nsimilarity_model = "{args.similarity_model}"\n'
+        for n in range(1, args.models + 1)
+    )
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(f"""[limits]
+default_model_rpm = {args.rpm}
+
+[scheduler]
+max_parallel_recipes = {args.models}
+
+[cache]
+enabled = false
+
+[engine]
+base_url = "{base_url}"
+api_key_env = "NVIDIA_BUILD_API_KEY"
+requests_per_minute = {args.rpm}
+max_concurrency = {args.concurrency}
+pool_connections = {max(32, args.concurrency * args.models)}
+pack_size = {args.pack_size}
+stream = {str(args.stream).lower()}
+
+[output]
+format = "{args.output_format}"
+
+{recipes}""")
+
+def run_stage(stage, workdir, env, profile):
+    """Run one main.py command in the scratch directory and return its wall-clock seconds"""
+    command = [sys.executable, os.path.join(REPO_ROOT, "main.py")]
+    if profile:
+        command += ["--profile", "--profile-dir", os.path.join("output", "profile", stage)]
+    command.append(stage)
+    log_path = os.path.join(workdir, f"{stage}.log")
+    started = time.perf_counter()
+    with open(log_path, 'w', encoding='utf-8') as log:
+        result = subprocess.run(command, cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT)
+    elapsed = time.perf_counter() - started
+    if result.returncode != 0:
+        raise RuntimeError(f"{stage} failed with exit code {result.returncode}; see {log_path}")
+    return elapsed
+
+def metrics_path(workdir):
+    return os.path.join(workdir, "output", "metrics.json")
+
+def read_metrics(workdir):
+    path = metrics_path(workdir)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def processed_rows(metrics, stage):
+    """Rows a stage actually got through, from stage_rows_total (translations that failed don't count)"""
+    if metrics is None:
+        return 0
+    counters = metrics.get('counters', {})
+    rows = sum(s['value'] for s in counters.get('stage_rows_total', [])
+               if s['labels'].get('stage') == STAGE_METRICS[stage])
+    if stage == "translate":
+        rows -= sum(s['value'] for s in counters.get('failed_rows_total', []))
+    return int(rows)
+
+def summarise_metrics(metrics):
+    """Request count, retries, 429-driven failures and latency percentiles across every series"""
+    if metrics is None:
+        return {}
+    counters = metrics.get('counters', {})
+    summary = {
+        'requests_ok': sum(s['value'] for s in counters.get('requests_total', []) if s['labels'].get('outcome') == 'ok'),
+        'requests_failed': sum(s['value'] for s in counters.get('requests_total', []) if s['labels'].get('outcome') == 'error'),
+        'retries': sum(s['value'] for s in counters.get('retries_total', [])),
+        'empty_translations': sum(s['value'] for s in counters.get('empty_translations_total', [])),
+    }
+    latencies = metrics.get('histograms', {}).get('request_seconds', [])
+    if latencies:
+        # Percentiles of the busiest series stand in for the run; per-series values are in metrics.json
+        busiest = max(latencies, key=lambda s: s['count'])
+        summary.update({'latency_p50': busiest['p50'], 'latency_p95': busiest['p95']})
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline throughput benchmark of the translation pipeline")
+    parser.add_argument('--rows', type=int, default=200, help="sentences per language pair (default: 200)")
+    parser.add_argument('--pairs', default="ewe-eng,twi-eng", help="comma-separated language pairs (default: ewe-eng,twi-eng)")
+    parser.add_argument('--models', type=int, default=3, help="mock recipes, one model each (default: 3)")
+    parser.add_argument('--rpm', type=int, default=6000, help="requests per minute per model (default: 6000)")
+    parser.add_argument('--concurrency', type=int, default=8, help="requests in flight per recipe (default: 8)")
+    parser.add_argument('--stages', default=",".join(STAGES), help="stages to run, in order (default: translate,score,report)")
+    parser.add_argument('--similarity-model', default="sentence-transformers/all-MiniLM-L6-v2",
+                        help="embedding model for the score stage")
+    parser.add_argument('--pack-size', type=int, default=1, help="sentences per request (default: 1)")
+    parser.add_argument('--stream', action='store_true', help="stream responses with early cut-off")
+    parser.add_argument('--output-format', choices=["csv", "parquet"], default="csv")
+    parser.add_argument('--profile', action='store_true', help="run each stage with main.py --profile")
+    parser.add_argument('--workdir', help="scratch directory (default: a new temporary directory)")
+    parser.add_argument('--keep', action='store_true', help="keep the scratch directory afterwards")
+    parser.add_argument('--json-out', help="also write the results to this JSON file")
+    add_server_arguments(parser)
+    args = parser.parse_args()
+
+    stages = args.stages.split(',')
+    unknown = [s for s in stages if s not in STAGES]
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(unknown)}")
+    pairs = args.pairs.split(',')
+
+    server = start_server(settings_from_args(args))
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    workdir = args.workdir or tempfile.mkdtemp(prefix="pipeline-bench-")
+    os.makedirs(os.path.join(workdir, "recipes"), exist_ok=True)
+    write_inputs(os.path.join(workdir, "input"), pairs, args.rows, args.seed)
+    write_config(os.path.join(workdir, "pipeline.toml"), base_url, args)
+    env = {**os.environ, 'PIPELINE_CONFIG': os.path.join(workdir, "pipeline.toml"), 'NVIDIA_BUILD_API_KEY': "mock"}
+
+    sentences = args.rows * len(pairs) * args.models
+    print(f"Benchmarking {', '.join(stages)}: {len(pairs)} pairs x {args.rows} rows x {args.models} models "
+          f"against {base_url} (latency {args.latency}, 429 rate {args.rate_429})")
+    print(f"Scratch directory: {workdir}")
+
+    results = {'settings': vars(args), 'stages': {}}
+    finished = False
+    try:
+        for stage in stages:
+            # A stage that dies before exporting must not be measured with the previous stage's metrics
+            if os.path.exists(metrics_path(workdir)):
+                os.remove(metrics_path(workdir))
+            seconds = run_stage(stage, workdir, env, args.profile)
+            entry = {'seconds': seconds}
+            if stage != "report":
+                # main.py exits 0 even when every recipe failed, so throughput counts the rows it really did
+                metrics = read_metrics(workdir)
+                entry['sentences'] = processed_rows(metrics, stage)
+                entry['sentences_per_second'] = entry['sentences'] / seconds if seconds else None
+                entry.update(summarise_metrics(metrics))
+                if entry['sentences'] < sentences:
+                    raise RuntimeError(f"{stage} only processed {entry['sentences']}/{sentences} sentences; "
+                                       f"see {os.path.join(workdir, stage + '.log')}")
+            results['stages'][stage] = entry
+            print(f"{stage}: {seconds:.2f}s" + (f", {entry['sentences_per_second']:.1f} sentences/s" if 'sentences' in entry else ""))
+        finished = True
+    finally:
+        server.shutdown()
+        results['server'] = dict(server.settings.stats)
+        # A failed run keeps its scratch directory, so its logs can be read
+        if finished and not args.keep and not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"\n{'stage':<10} {'wall s':>8} {'sent/s':>8} {'p50 s':>7} {'p95 s':>7} {'retries':>8}")
+    for stage, entry in results['stages'].items():
+        def fmt(key, spec):
+            return format(entry[key], spec) if entry.get(key) is not None else "-"
+        print(f"{stage:<10} {entry['seconds']:>8.2f} {fmt('sentences_per_second', '>8.1f'):>8} "
+              f"{fmt('latency_p50', '>7.3f'):>7} {fmt('latency_p95', '>7.3f'):>7} {fmt('retries', '>8'):>8}")
+    print(f"Mock server: {results['server']}")
+
+    if args.json_out:
+        with open(args.json_out, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.json_out}")
+
+if __name__ == "__main__":
+    main()
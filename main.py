@@ -1,27 +1,35 @@
 import os
 import pandas as pd
-import importlib.util
 from pathlib import Path
 import re
 import sys
-import json
+import threading
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 
 # Add utils to path
 sys.path.append(os.path.join(os.path.dirname(__file__), 'utils'))
-from reporting import generate_report
+from config import get_setting
+from row_journal import RowJournal, row_hash
+from state_store import StateStore
+from translation_cache import print_cache_stats
+from cassette import print_cassette_stats, use_cassette
+from batch_jobs import BatchWriter, make_custom_id, parse_custom_id, read_results
+from similarity import score_outputs
+from model_registry import get_model
+from recipe_manifest import accepts_journal, discover_recipes, supports_mode
+from sharding import TranslationUnit, unit_id, parse_shard, in_shard, row_ranges
+from work_queue import WorkQueue, Heartbeat, default_worker_id
+from metrics import get_metrics, export_metrics
+from profiler import get_profiler, span
+from token_budget import calibrate as calibrate_token_budget
+from output_io import OUTPUT_EXTENSIONS, OutputWriter, get_output_format, read_output, write_output, find_output
 
 def load_recipes(recipes_dir="recipes"):
-    recipes = {}
-    for file in os.listdir(recipes_dir):
-        if file.endswith(".py") and file != "__init__.py":
-            module_name = file[:-3]
-            spec = importlib.util.spec_from_file_location(
-                module_name, os.path.join(recipes_dir, file)
-            )
-            module = importlib.util.module_from_spec(spec)
-            spec.loader.exec_module(module)
-            recipes[module_name] = module
-    return recipes
+    """Discover recipes from the manifest; each module is imported only when a stage uses it"""
+    return discover_recipes(recipes_dir)
 
 def extract_language_pair_from_filename(filename):
     """Extract language pair from filename in format source-target.csv"""
@@ -31,215 +39,704 @@ def extract_language_pair_from_filename(filename):
         return match.group(1), match.group(2)
     return None, None
 
-def load_processing_state(state_file="processing_state.json"):
-    """Load the processing state from a JSON file"""
-    if os.path.exists(state_file):
-        try:
-            with open(state_file, 'r') as f:
-                return json.load(f)
-        except:
-            # If file is corrupted, create a new one
-            print("State file corrupted, creating a new one")
-            with open(state_file, 'w') as f:
-                json.dump({}, f)
-            return {}
-    else:
-        # Create an empty state file if it doesn't exist
-        print("Creating new state file")
-        with open(state_file, 'w') as f:
-            json.dump({}, f)
-        return {}
+def load_processing_state(state_file="processing_state.db", legacy_state_file="processing_state.json"):
+    """Open the processing state store, migrating a legacy JSON state file on first use"""
+    state = StateStore(state_file)
+    if os.path.exists(legacy_state_file):
+        state.migrate_from_json(legacy_state_file)
+    return state
 
-def save_processing_state(state, state_file="processing_state.json"):
-    """Save the processing state to a JSON file"""
+def update_processing_state(state, state_key, **flags):
+    """Set completion flags for one pair/file/recipe and persist them"""
     try:
-        with open(state_file, 'w') as f:
-            json.dump(state, f, indent=2)
-        print(f"State saved with {len(state)} entries")
+        state.update(state_key, **flags)
+        print(f"State saved for {state_key}")
     except Exception as e:
         print(f"Error saving state: {str(e)}")
 
-def process_csv(input_path, recipe_module, source_lang, target_lang, mode="full"):
-    df = pd.read_csv(input_path)
+def run_concurrently(jobs):
+    """Run the recipe jobs of one language pair at the same time.
+
+    Each recipe is throttled by the shared per-model and per-key token buckets
+    (see pipeline.toml), so running them side by side keeps every model
+    endpoint busy instead of one at a time.
+    """
+    if not jobs:
+        return
+    max_workers = get_setting('scheduler', 'max_parallel_recipes', 4)
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(jobs)))) as executor:
+        futures = [executor.submit(job) for job in jobs]
+        for future in futures:
+            future.result()
+
+def process_csv(input_path, recipe_module, source_lang, target_lang, mode="full", journal=None):
+    # Inputs are CSV; outputs being re-scored may also be Parquet
+    df = read_output(input_path)
     
     # Process with the specified language codes
-    if mode == "translation_only" and hasattr(recipe_module, 'translation_only'):
-        processed_df = recipe_module.translation_only(df, source_lang=source_lang, target_lang=target_lang)
-    elif mode == "similarity_only" and hasattr(recipe_module, 'similarity_only'):
+    if mode == "translation_only" and supports_mode(recipe_module, 'translation_only'):
+        processed_df = recipe_module.translation_only(df, source_lang=source_lang, target_lang=target_lang,
+                                                      **journal_kwargs(recipe_module, 'translation_only', journal))
+    elif mode == "similarity_only" and supports_mode(recipe_module, 'similarity_only'):
         processed_df = recipe_module.similarity_only(df)
     else:
-        processed_df = recipe_module.process_dataframe(df, source_lang=source_lang, target_lang=target_lang)
+        processed_df = recipe_module.process_dataframe(df, source_lang=source_lang, target_lang=target_lang,
+                                                       **journal_kwargs(recipe_module, 'process_dataframe', journal))
     
     return processed_df
 
+def journal_kwargs(recipe_module, mode, journal):
+    """Pass the row journal only to recipes that resume from one; older recipe modules don't take it"""
+    if journal is None or not accepts_journal(recipe_module, mode):
+        return {}
+    return {'journal': journal}
+
 def get_output_filename(input_filename, recipe_name):
-    """Generate output filename with recipe prefix"""
-    name, ext = os.path.splitext(input_filename)
-    return f"{name}_{recipe_name}{ext}"
+    """Generate output filename with recipe prefix, in the configured output format"""
+    name, _ = os.path.splitext(input_filename)
+    return f"{name}_{recipe_name}{OUTPUT_EXTENSIONS[get_output_format()]}"
 
-def run_translation_only(input_dir, output_dir, recipes, state):
-    """Run only the translation part"""
-    print("Running translation only...")
-    print(f"Initial state: {len(state)} entries")
+def get_journal_path(output_path):
+    """Row journal for an output file, kept in a hidden folder next to it"""
+    output_dir, output_filename = os.path.split(output_path)
+    name, _ = os.path.splitext(output_filename)
+    return os.path.join(output_dir, ".journal", f"{name}.jsonl")
+
+def keep_previous_scores(df, output_path):
+    """Carry the scores of an earlier output over to a new translation of the same rows.
+
+    Rows are matched by position and source text (and reference), so rows
+    appended to or changed in the input since then simply start without a
+    score. Scores are stored with a hash of the translation they belong to,
+    so the similarity stage only re-scores the rows whose translation has
+    changed.
+    """
+    previous_path = find_output(output_path)
+    if previous_path is None:
+        return df
+    try:
+        previous = read_output(previous_path, columns=['text', 'ref', 'similarity_score', 'translated_hash'])
+    except Exception as e:
+        print(f"Could not read previous scores from {previous_path}: {str(e)}")
+        return df
+    if not {'text', 'similarity_score', 'translated_hash'} <= set(previous.columns):
+        return df
     
-    # Process each CSV file in the input directory
-    for file in os.listdir(input_dir):
+    def refs(frame):
+        return frame['ref'].fillna('').astype(str).tolist() if 'ref' in frame.columns else [''] * len(frame)
+    
+    previous_scores = {
+        row_hash(index, text): (ref, score, translated_hash)
+        for index, text, ref, score, translated_hash in zip(previous.index, previous['text'], refs(previous),
+                                                             previous['similarity_score'], previous['translated_hash'])
+    }
+    matches = [previous_scores.get(row_hash(index, text)) for index, text in zip(df.index, df['text'])]
+    matches = [match if match is not None and match[0] == ref else None for match, ref in zip(matches, refs(df))]
+    if not any(match is not None for match in matches):
+        return df
+    df = df.copy()
+    df['similarity_score'] = pd.Series([match[1] if match is not None else float('nan') for match in matches],
+                                       index=df.index, dtype='float32')
+    df['translated_hash'] = [match[2] if match is not None else None for match in matches]
+    return df
+
+def translate_with_recipe(input_path, output_path, recipe_name, recipe_module,
+                          source_lang, target_lang, state, state_key):
+    """Translate one input file with one recipe and record it in the state"""
+    file = os.path.basename(input_path)
+    print(f"Processing {input_path} with recipe {recipe_name} for {source_lang}-{target_lang}")
+    
+    # Rows are journaled as they finish, so a restart resumes from the last completed row
+    journal = RowJournal(get_journal_path(output_path))
+    
+    try:
+        started = time.perf_counter()
+        with span(recipe_name):
+            result_df = process_csv(input_path, recipe_module, 
+                                  source_lang, target_lang, "translation_only", journal=journal)
+        get_metrics().record_stage('translation', len(result_df), time.perf_counter() - started,
+                                   pair=f"{source_lang}-{target_lang}", recipe=recipe_name)
+        with span("write_output"):
+            write_output(keep_previous_scores(result_df, output_path), output_path)
+        
+        # Update state; rows whose translation changed are re-scored by the next similarity run
+        update_processing_state(state, state_key, translation_completed=True, similarity_completed=False)
+        journal.remove()
+        
+        print(f"Completed translation with {recipe_name} on {file} for {source_lang}-{target_lang}")
+    except Exception as e:
+        print(f"Error applying {recipe_name} to {file} for {source_lang}-{target_lang}: {str(e)}")
+
+def list_language_pair_files(input_dir, pairs=None):
+    """Return (file, source_lang, target_lang) for each 'source-target.csv' file in the input directory.
+
+    pairs optionally restricts the result to language pairs such as 'ewe-eng'.
+    """
+    pair_files = []
+    for file in sorted(os.listdir(input_dir)):
         if file.endswith(".csv"):
             # Extract language pair from filename
             source_lang, target_lang = extract_language_pair_from_filename(file)
             if not source_lang or not target_lang:
                 print(f"Skipping {file}: filename should be in format 'source-target.csv'")
                 continue
-                
-            input_path = os.path.join(input_dir, file)
+            if pairs and f"{source_lang}-{target_lang}" not in pairs:
+                continue
+            pair_files.append((file, source_lang, target_lang))
+    return pair_files
+
+def build_translation_units(input_dir, recipes, pairs=None, chunk_size=500):
+    """Split the translation work into (pair file, recipe, row range) units"""
+    units = []
+    for file, source_lang, target_lang in list_language_pair_files(input_dir, pairs):
+        total_rows = len(pd.read_csv(os.path.join(input_dir, file), usecols=['text']))
+        for recipe_name in sorted(recipes):
+            for start, end in row_ranges(total_rows, chunk_size):
+                units.append(TranslationUnit(file, source_lang, target_lang, recipe_name, start, end))
+    return units
+
+def unit_state_key(unit):
+    """Processing state key of the file and recipe a unit belongs to"""
+    return f"{unit.source_lang}-{unit.target_lang}/{unit.file}/{unit.recipe_name}"
+
+def translate_unit(unit, input_dir, output_dir, recipes, state):
+    """Translate one row range of a file with one recipe, journaling rows into the unit's own segment.
+
+    Returns False if the recipe raised, so the unit can be retried.
+    """
+    recipe_module = recipes[unit.recipe_name]
+    input_path = os.path.join(input_dir, unit.file)
+    lang_pair_dir = os.path.join(output_dir, f"{unit.source_lang}-{unit.target_lang}")
+    os.makedirs(lang_pair_dir, exist_ok=True)
+    output_path = os.path.join(lang_pair_dir, get_output_filename(unit.file, unit.recipe_name))
+    state_key = unit_state_key(unit)
+    
+    print(f"Processing unit {unit_id(unit)}")
+    
+    # Each unit appends to its own journal segment, so shards never write to the same file
+    journal = RowJournal(get_journal_path(output_path), segment=f"{unit.start}-{unit.end}")
+    
+    try:
+        df = pd.read_csv(input_path).iloc[unit.start:unit.end]
+        started = time.perf_counter()
+        result_df = recipe_module.translation_only(df, source_lang=unit.source_lang, target_lang=unit.target_lang,
+                                                   **journal_kwargs(recipe_module, 'translation_only', journal))
+        if not accepts_journal(recipe_module, 'translation_only'):
+            # The recipe doesn't journal its rows itself, so record the unit's results for finalize_translation
+            try:
+                for index, text, translation in zip(result_df.index, result_df['text'], result_df['translated']):
+                    journal.append(row_hash(index, text), translation if isinstance(translation, str) else "")
+            finally:
+                journal.close()
+        get_metrics().record_stage('translation', len(df), time.perf_counter() - started,
+                                   pair=f"{unit.source_lang}-{unit.target_lang}", recipe=unit.recipe_name)
+    except Exception as e:
+        print(f"Error applying {unit.recipe_name} to unit {unit_id(unit)}: {str(e)}")
+        return False
+    
+    try:
+        finalize_translation(input_path, output_path, state, state_key)
+    except Exception as e:
+        print(f"Error finalizing {state_key}: {str(e)}")
+        return False
+    return True
+
+# One lock per output file, so units of a file finishing at the same time in this process finalize it once
+_finalize_locks = {}
+_finalize_locks_lock = threading.Lock()
+
+def finalize_translation(input_path, output_path, state, state_key, require_translations=False):
+    """Write the output file from the journal once every row has been attempted by some shard.
+
+    With require_translations, rows whose attempts all failed still count as pending.
+    """
+    with _finalize_locks_lock:
+        lock = _finalize_locks.setdefault(output_path, threading.Lock())
+    with lock:
+        # Another unit of this file may have finalized it while this one waited
+        if state.get(state_key, {}).get('translation_completed', False):
+            return True
+        return _finalize_translation(input_path, output_path, state, state_key, require_translations)
+
+def _finalize_translation(input_path, output_path, state, state_key, require_translations):
+    journal = RowJournal(get_journal_path(output_path))
+    attempted = journal.load(include_failed=not require_translations)
+    
+    df = pd.read_csv(input_path)
+    keys = [row_hash(index, text) for index, text in zip(df.index, df['text'])]
+    pending = sum(key not in attempted for key in keys)
+    if pending:
+        print(f"{state_key}: {pending}/{len(keys)} rows still pending in other units")
+        return False
+    
+    df['translated'] = [attempted[key] for key in keys]
+    
+    # Written atomically, so a shard finalising at the same time never sees a partial file
+    write_output(keep_previous_scores(df, output_path), output_path)
+    
+    update_processing_state(state, state_key, translation_completed=True, similarity_completed=False)
+    journal.remove()
+    print(f"Completed translation for {state_key}")
+    return True
+
+def translate_language_pair(input_dir, output_dir, file, source_lang, target_lang, recipes, state):
+    """Translate one language-pair file with every pending recipe at the same time"""
+    input_path = os.path.join(input_dir, file)
+    
+    # Create output directory for this language pair
+    lang_pair_dir = os.path.join(output_dir, f"{source_lang}-{target_lang}")
+    os.makedirs(lang_pair_dir, exist_ok=True)
+    
+    jobs = []
+    for recipe_name, recipe_module in recipes.items():
+        # Generate recipe-specific output filename
+        output_filename = get_output_filename(file, recipe_name)
+        output_path = os.path.join(lang_pair_dir, output_filename)
+        
+        # Check if this recipe has already completed translation for this file
+        state_key = f"{source_lang}-{target_lang}/{file}/{recipe_name}"
+        if state.get(state_key, {}).get('translation_completed', False):
+            print(f"Skipping translation for {recipe_name} on {file} ({source_lang}-{target_lang}) - already completed")
+            continue
+        
+        # Check if recipe supports translation only mode
+        if not supports_mode(recipe_module, 'translation_only'):
+            print(f"Recipe {recipe_name} doesn't support translation-only mode")
+            continue
+        
+        jobs.append(partial(translate_with_recipe, input_path, output_path, recipe_name, recipe_module,
+                            source_lang, target_lang, state, state_key))
+    
+    # All recipes for this language pair run at the same time
+    run_concurrently(jobs)
+
+def score_language_pair(input_dir, output_dir, file, source_lang, target_lang, recipes, state):
+    """Score every translated output of one language pair, encoding its references only once"""
+    input_path = os.path.join(input_dir, file)
+    lang_pair_dir = os.path.join(output_dir, f"{source_lang}-{target_lang}")
+    os.makedirs(lang_pair_dir, exist_ok=True)
+    
+    pending = []
+    for recipe_name, recipe_module in recipes.items():
+        # Generate recipe-specific output filename
+        output_filename = get_output_filename(file, recipe_name)
+        output_path = os.path.join(lang_pair_dir, output_filename)
+        
+        # Check if translation has been completed
+        state_key = f"{source_lang}-{target_lang}/{file}/{recipe_name}"
+        if not state.get(state_key, {}).get('translation_completed', False):
+            print(f"Skipping similarity for {recipe_name} on {file} ({source_lang}-{target_lang}) - translation not completed")
+            continue
+        
+        # Check if similarity has already been completed
+        if state.get(state_key, {}).get('similarity_completed', False):
+            print(f"Skipping similarity for {recipe_name} on {file} ({source_lang}-{target_lang}) - already completed")
+            continue
+        
+        # Check if recipe supports similarity only mode
+        if not supports_mode(recipe_module, 'similarity_only'):
+            print(f"Recipe {recipe_name} doesn't support similarity-only mode")
+            continue
+        
+        # The output may have been written in another format than the one configured now
+        existing_output_path = find_output(output_path)
+        if existing_output_path is None:
+            print(f"File not found: {output_path}")
+            continue
+        output_path = existing_output_path
+        
+        pending.append((recipe_name, recipe_module, output_path, state_key))
+    
+    # Recipes that name their embedding model are scored together, one group per model
+    groups = {}
+    for entry in pending:
+        model_name = getattr(entry[1], 'similarity_model_name', None)
+        groups.setdefault(model_name, []).append(entry)
+    
+    for model_name, entries in groups.items():
+        if model_name is None:
+            for recipe_name, recipe_module, output_path, state_key in entries:
+                score_with_recipe(output_path, recipe_name, recipe_module, file,
+                                  source_lang, target_lang, state, state_key)
+            continue
+        
+        print(f"Processing similarity for {', '.join(e[0] for e in entries)} on {file} ({source_lang}-{target_lang}) with {model_name}")
+        try:
+            with span("read_outputs"):
+                ref_texts = pd.read_csv(input_path, usecols=['ref'])['ref'].fillna('').astype(str).tolist()
+                outputs = [read_output(output_path) for _, _, output_path, _ in entries]
+            # Only rows without a score or with a changed translation are embedded
+            model = get_model(model_name)
+            started = time.perf_counter()
+            with span("embedding"):
+                scored_rows = score_outputs(model, ref_texts, outputs)
+            seconds = time.perf_counter() - started
+        except Exception as e:
+            print(f"Error calculating similarity on {file} for {source_lang}-{target_lang}: {str(e)}")
+            continue
+        
+        for (recipe_name, _, output_path, state_key), df, rows in zip(entries, outputs, scored_rows):
+            print(f"Scored {rows}/{len(df)} rows of {os.path.basename(output_path)}")
+            # The batched pass is shared, so its time is split between recipes by rows scored
+            get_metrics().record_stage('similarity', rows, seconds * rows / max(sum(scored_rows), 1),
+                                       pair=f"{source_lang}-{target_lang}", recipe=recipe_name)
+            if rows:
+                with span("write_output"):
+                    write_output(df, output_path)
             
-            # Create output directory for this language pair
-            lang_pair_dir = os.path.join(output_dir, f"{source_lang}-{target_lang}")
-            os.makedirs(lang_pair_dir, exist_ok=True)
+            # Update state
+            update_processing_state(state, state_key, similarity_completed=True)
             
-            for recipe_name, recipe_module in recipes.items():
-                # Generate recipe-specific output filename
-                output_filename = get_output_filename(file, recipe_name)
-                output_path = os.path.join(lang_pair_dir, output_filename)
-                
-                # Check if this recipe has already completed translation for this file
-                state_key = f"{source_lang}-{target_lang}/{file}/{recipe_name}"
-                if state.get(state_key, {}).get('translation_completed', False):
-                    print(f"Skipping translation for {recipe_name} on {file} ({source_lang}-{target_lang}) - already completed")
-                    continue
-                
-                print(f"Processing {input_path} with recipe {recipe_name} for {source_lang}-{target_lang}")
-                
-                try:
-                    # Check if recipe supports translation only mode
-                    if hasattr(recipe_module, 'translation_only'):
-                        result_df = process_csv(input_path, recipe_module, 
-                                              source_lang, target_lang, "translation_only")
-                        result_df.to_csv(output_path, index=False)
-                        
-                        # Update state
-                        if state_key not in state:
-                            state[state_key] = {}
-                        state[state_key]['translation_completed'] = True
-                        save_processing_state(state)
-                        
-                        print(f"Completed translation with {recipe_name} on {file} for {source_lang}-{target_lang}")
-                    else:
-                        print(f"Recipe {recipe_name} doesn't support translation-only mode")
-                except Exception as e:
-                    print(f"Error applying {recipe_name} to {file} for {source_lang}-{target_lang}: {str(e)}")
+            print(f"Completed similarity with {recipe_name} on {file} for {source_lang}-{target_lang}")
+
+def score_with_recipe(output_path, recipe_name, recipe_module, file,
+                      source_lang, target_lang, state, state_key):
+    """Score one output file with the recipe's own similarity_only"""
+    print(f"Processing similarity for {recipe_name} on {file} ({source_lang}-{target_lang})")
     
+    try:
+        started = time.perf_counter()
+        result_df = process_csv(output_path, recipe_module, 
+                              source_lang, target_lang, "similarity_only")
+        get_metrics().record_stage('similarity', len(result_df), time.perf_counter() - started,
+                                   pair=f"{source_lang}-{target_lang}", recipe=recipe_name)
+        write_output(result_df, output_path)
+        
+        # Update state
+        update_processing_state(state, state_key, similarity_completed=True)
+        
+        print(f"Completed similarity with {recipe_name} on {file} for {source_lang}-{target_lang}")
+    except Exception as e:
+        print(f"Error applying similarity with {recipe_name} to {file} for {source_lang}-{target_lang}: {str(e)}")
+
+def run_translation_only(input_dir, output_dir, recipes, state, pairs=None, shard=None, chunk_size=500):
+    """Run only the translation part.
+
+    With a shard (i, N) the work is split into (pair file, recipe, row range)
+    units and only this shard's units are translated; whichever shard
+    finishes the last rows of a file writes its output.
+    """
+    print("Running translation only...")
+    print(f"Initial state: {len(state)} entries")
+    
+    if shard is None:
+        # Process each CSV file in the input directory
+        for file, source_lang, target_lang in list_language_pair_files(input_dir, pairs):
+            with span(f"{source_lang}-{target_lang}"):
+                translate_language_pair(input_dir, output_dir, file, source_lang, target_lang, recipes, state)
+    else:
+        units = build_translation_units(input_dir, recipes, pairs, chunk_size)
+        jobs = []
+        for unit in units:
+            if not in_shard(unit_id(unit), shard):
+                continue
+            if state.get(unit_state_key(unit), {}).get('translation_completed', False):
+                continue
+            if not supports_mode(recipes[unit.recipe_name], 'translation_only'):
+                print(f"Recipe {unit.recipe_name} doesn't support translation-only mode")
+                continue
+            jobs.append(partial(translate_unit, unit, input_dir, output_dir, recipes, state))
+        print(f"Shard {shard[0]}/{shard[1]}: {len(jobs)} of {len(units)} units to translate")
+        run_concurrently(jobs)
+    
+    print_cache_stats()
+    print_cassette_stats()
     print(f"Translation process completed! Final state: {len(state)} entries")
 
-def run_similarity_only(input_dir, output_dir, recipes, state):
-    """Run only the similarity comparison part"""
-    print("Running similarity comparison only...")
+def run_translation_queue(input_dir, output_dir, recipes, state, pairs=None, chunk_size=500,
+                          workers=None, worker_id=None):
+    """Translate by pulling units from a lease-based queue shared by every worker on the output directory.
+
+    Any number of main.py processes (on any machine that sees the same output
+    directory) can run this at once; each unit is leased to one worker at a
+    time, kept alive by heartbeats, and handed to another worker if its lease
+    expires because the owner crashed. All workers must use the same chunk size.
+    """
+    print("Running translation from the shared work queue...")
     print(f"Initial state: {len(state)} entries")
     
-    # Process each CSV file in the input directory
-    for file in os.listdir(input_dir):
-        if file.endswith(".csv"):
-            # Extract language pair from filename
-            source_lang, target_lang = extract_language_pair_from_filename(file)
-            if not source_lang or not target_lang:
-                print(f"Skipping {file}: filename should be in format 'source-target.csv'")
+    queue = get_work_queue(output_dir)
+    heartbeat_seconds = get_setting('queue', 'heartbeat_seconds', 60)
+    worker_id = worker_id or default_worker_id()
+    workers = workers or get_setting('scheduler', 'max_parallel_recipes', 4)
+    
+    units = {unit_id(unit): unit for unit in build_translation_units(input_dir, recipes, pairs, chunk_size)
+             if supports_mode(recipes[unit.recipe_name], 'translation_only')}
+    # Units finished in an earlier run stay done; `main.py reset` removes them so they are queued again
+    queue.enqueue(units)
+    
+    # Units that failed in this process aren't claimed again until the next run
+    failed = set()
+    
+    def work(worker_name):
+        while True:
+            task_id = queue.claim(worker_name, task_ids=units.keys() - failed)
+            if task_id is None:
+                return
+            unit = units[task_id]
+            if state.get(unit_state_key(unit), {}).get('translation_completed', False):
+                queue.complete(task_id, worker_name)
                 continue
-                
-            # Create output directory for this language pair
-            lang_pair_dir = os.path.join(output_dir, f"{source_lang}-{target_lang}")
-            os.makedirs(lang_pair_dir, exist_ok=True)
             
+            with Heartbeat(queue, task_id, worker_name, heartbeat_seconds):
+                succeeded = translate_unit(unit, input_dir, output_dir, recipes, state)
+            if succeeded:
+                queue.complete(task_id, worker_name)
+            else:
+                failed.add(task_id)
+                queue.release(task_id, worker_name)
+    
+    run_concurrently([partial(work, f"{worker_id}-{n}") for n in range(workers)])
+    
+    counts = queue.counts()
+    print(f"Work queue: {counts['done']} done, {counts['leased']} leased by other workers, {counts['pending']} pending")
+    print_cache_stats()
+    print_cassette_stats()
+    print(f"Translation process completed! Final state: {len(state)} entries")
+
+def translation_output_path(output_dir, file, source_lang, target_lang, recipe_name):
+    """Output file of one recipe for one language-pair file"""
+    return os.path.join(output_dir, f"{source_lang}-{target_lang}", get_output_filename(file, recipe_name))
+
+def export_translation_batch(input_dir, output_dir, recipes, state, batch_path, pairs=None):
+    """Write every pending translation request to a batch JSONL file instead of sending it.
+
+    Rows are pending when their recipe hasn't completed the file and they
+    aren't already in its journal; each request's custom_id is
+    pair/file/recipe/row, so the results can be matched back with
+    import_translation_batch.
+    """
+    writer = BatchWriter(batch_path)
+    try:
+        for file, source_lang, target_lang in list_language_pair_files(input_dir, pairs):
+            pair = f"{source_lang}-{target_lang}"
+            df = pd.read_csv(os.path.join(input_dir, file))
             for recipe_name, recipe_module in recipes.items():
-                # Generate recipe-specific output filename
-                output_filename = get_output_filename(file, recipe_name)
-                output_path = os.path.join(lang_pair_dir, output_filename)
-                
-                # Check if translation has been completed
-                state_key = f"{source_lang}-{target_lang}/{file}/{recipe_name}"
-                if not state.get(state_key, {}).get('translation_completed', False):
-                    print(f"Skipping similarity for {recipe_name} on {file} ({source_lang}-{target_lang}) - translation not completed")
+                state_key = f"{pair}/{file}/{recipe_name}"
+                if state.get(state_key, {}).get('translation_completed', False):
                     continue
-                
-                # Check if similarity has already been completed
-                if state.get(state_key, {}).get('similarity_completed', False):
-                    print(f"Skipping similarity for {recipe_name} on {file} ({source_lang}-{target_lang}) - already completed")
+                if not hasattr(recipe_module, 'batch_request'):
+                    print(f"Recipe {recipe_name} doesn't support batch jobs; skipping it")
                     continue
-                
-                print(f"Processing similarity for {recipe_name} on {file} ({source_lang}-{target_lang})")
-                
-                try:
-                    # Check if recipe supports similarity only mode
-                    if hasattr(recipe_module, 'similarity_only'):
-                        # Read the file that should contain translations
-                        if os.path.exists(output_path):
-                            df = pd.read_csv(output_path)
-                            result_df = process_csv(output_path, recipe_module, 
-                                                  source_lang, target_lang, "similarity_only")
-                            result_df.to_csv(output_path, index=False)
-                            
-                            # Update state
-                            state[state_key]['similarity_completed'] = True
-                            save_processing_state(state)
-                            
-                            print(f"Completed similarity with {recipe_name} on {file} for {source_lang}-{target_lang}")
-                        else:
-                            print(f"File not found: {output_path}")
-                    else:
-                        print(f"Recipe {recipe_name} doesn't support similarity-only mode")
-                except Exception as e:
-                    print(f"Error applying similarity with {recipe_name} to {file} for {source_lang}-{target_lang}: {str(e)}")
+                output_path = translation_output_path(output_dir, file, source_lang, target_lang, recipe_name)
+                completed = RowJournal(get_journal_path(output_path)).load()
+                exported = 0
+                for index, text in zip(df.index, df['text']):
+                    if row_hash(index, text) in completed:
+                        continue
+                    writer.write(make_custom_id(pair, file, recipe_name, index),
+                                 recipe_module.batch_request(text, source_lang, target_lang))
+                    exported += 1
+                if exported:
+                    print(f"{state_key}: exported {exported}/{len(df)} rows")
+    finally:
+        writer.close()
+    print(f"Wrote {writer.count} batch requests to {batch_path}")
+
+def import_translation_batch(input_dir, output_dir, recipes, state, results_path, pairs=None):
+    """Journal the translations of a batch results file and finish every output it completes.
+
+    Failed results, and answers without a translation in them, aren't
+    journaled: their rows stay pending, so an output is only finished once
+    every row has a translation, and the next export asks for them again.
+    """
+    results = {}
+    for custom_id, response_text, error in read_results(results_path):
+        try:
+            pair, file, recipe_name, row = parse_custom_id(custom_id or "")
+        except ValueError as e:
+            print(f"Skipping result: {str(e)}")
+            continue
+        if error:
+            print(f"{custom_id} failed: {error}")
+        results.setdefault((pair, file, recipe_name), {})[row] = response_text
+
+    imported = failed = 0
+    for (pair, file, recipe_name), rows in sorted(results.items()):
+        if pairs and pair not in pairs:
+            continue
+        if recipe_name not in recipes:
+            print(f"Skipping {len(rows)} results for recipe {recipe_name}, which isn't selected")
+            continue
+        if not hasattr(recipes[recipe_name], 'batch_translation'):
+            print(f"Recipe {recipe_name} doesn't support batch jobs; skipping its {len(rows)} results")
+            continue
+        if state.get(f"{pair}/{file}/{recipe_name}", {}).get('translation_completed', False):
+            print(f"Skipping {len(rows)} results for {pair}/{file}/{recipe_name} - already completed")
+            continue
+        source_lang, target_lang = pair.split('-', 1)
+        input_path = os.path.join(input_dir, file)
+        df = pd.read_csv(input_path)
+        output_path = translation_output_path(output_dir, file, source_lang, target_lang, recipe_name)
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        
+        # Imported rows go to their own journal segment, next to any interactive run's
+        journal = RowJournal(get_journal_path(output_path), segment="batch")
+        try:
+            for row, response_text in rows.items():
+                if row not in df.index:
+                    print(f"Skipping {pair}/{file}/{recipe_name}/{row}: no such row in {file}")
+                    continue
+                translation = recipes[recipe_name].batch_translation(response_text)
+                if not translation:
+                    failed += 1
+                    continue
+                journal.append(row_hash(row, df.at[row, 'text']), translation)
+                imported += 1
+        finally:
+            journal.close()
+        # Rows that failed in earlier interactive runs are left for the next export too
+        finalize_translation(input_path, output_path, state, f"{pair}/{file}/{recipe_name}",
+                             require_translations=True)
+    print(f"Imported {imported} batch results from {results_path}"
+          + (f"; {failed} failed or had no translation and stay pending" if failed else ""))
+
+def run_similarity_only(input_dir, output_dir, recipes, state, pairs=None, shard=None):
+    """Run only the similarity comparison part (for this shard's language-pair files, if sharded)"""
+    print("Running similarity comparison only...")
+    print(f"Initial state: {len(state)} entries")
+    
+    # Process each CSV file in the input directory
+    for file, source_lang, target_lang in list_language_pair_files(input_dir, pairs):
+        if not in_shard(file, shard):
+            continue
+        with span(f"{source_lang}-{target_lang}"):
+            score_language_pair(input_dir, output_dir, file, source_lang, target_lang, recipes, state)
     
     print(f"Similarity process completed! Final state: {len(state)} entries")
 
-def run_full_process(input_dir, output_dir, recipes, state):
-    """Run the full process (translation + similarity)"""
+def score_chunk(translated_chunks, recipes, ref_texts):
+    """Add similarity scores to one chunk of every recipe's translations, sharing reference embeddings"""
+    groups = {}
+    for recipe_name in translated_chunks:
+        model_name = getattr(recipes[recipe_name], 'similarity_model_name', None)
+        groups.setdefault(model_name, []).append(recipe_name)
+    
+    scored = {}
+    for model_name, recipe_names in groups.items():
+        if model_name is None:
+            for recipe_name in recipe_names:
+                scored[recipe_name] = recipes[recipe_name].similarity_only(translated_chunks[recipe_name])
+            continue
+        outputs = [translated_chunks[recipe_name] for recipe_name in recipe_names]
+        score_outputs(get_model(model_name), ref_texts, outputs)
+        for recipe_name, df in zip(recipe_names, outputs):
+            scored[recipe_name] = df
+    return scored
+
+def stream_language_pair(input_dir, output_dir, file, source_lang, target_lang, recipes, state, chunk_size=1000):
+    """Translate and score one language-pair file in fixed-size chunks, appending each chunk to the outputs.
+
+    Only one chunk per recipe is held in memory at a time, so peak memory stays
+    flat however large the input is. Rows are still journaled as they finish,
+    so an interrupted run replays finished chunks from the journal.
+    """
+    input_path = os.path.join(input_dir, file)
+    lang_pair_dir = os.path.join(output_dir, f"{source_lang}-{target_lang}")
+    os.makedirs(lang_pair_dir, exist_ok=True)
+    
+    pending = {}
+    translated = {}
+    for recipe_name, recipe_module in recipes.items():
+        state_key = f"{source_lang}-{target_lang}/{file}/{recipe_name}"
+        if state.get(state_key, {}).get('similarity_completed', False):
+            print(f"Skipping {recipe_name} for {file} ({source_lang}-{target_lang}) - already processed")
+            continue
+        if state.get(state_key, {}).get('translation_completed', False):
+            # Translated by an earlier run: only its existing output still needs scoring
+            translated[recipe_name] = recipe_module
+            continue
+        if not supports_mode(recipe_module, 'translation_only'):
+            print(f"Recipe {recipe_name} doesn't support translation-only mode")
+            continue
+        output_path = os.path.join(lang_pair_dir, get_output_filename(file, recipe_name))
+        pending[recipe_name] = {
+            'output_path': output_path,
+            # Chunks are appended to a partial file that replaces the output once complete
+            'partial_path': f"{output_path}.partial",
+            'writer': OutputWriter(f"{output_path}.partial", get_output_format()),
+            # Chunks are journaled in order, so the journal stops being read past the resume point
+            'journal': RowJournal(get_journal_path(output_path), sequential=True),
+            'state_key': state_key
+        }
+    if translated:
+        score_language_pair(input_dir, output_dir, file, source_lang, target_lang, translated, state)
+    if not pending:
+        return
+    
+    for chunk_number, chunk in enumerate(pd.read_csv(input_path, chunksize=chunk_size)):
+        print(f"Streaming chunk {chunk_number + 1} of {file} (rows {chunk.index[0] + 1}-{chunk.index[-1] + 1})")
+        translated_chunks = {}
+        
+        def translate_chunk(recipe_name):
+            try:
+                started = time.perf_counter()
+                translated_chunks[recipe_name] = recipes[recipe_name].translation_only(
+                    chunk, source_lang=source_lang, target_lang=target_lang,
+                    **journal_kwargs(recipes[recipe_name], 'translation_only', pending[recipe_name]['journal']))
+                get_metrics().record_stage('translation', len(chunk), time.perf_counter() - started,
+                                           pair=f"{source_lang}-{target_lang}", recipe=recipe_name)
+            except Exception as e:
+                print(f"Error applying {recipe_name} to {file} for {source_lang}-{target_lang}: {str(e)}")
+        
+        # All recipes translate the chunk at the same time
+        run_concurrently([partial(translate_chunk, recipe_name) for recipe_name in pending])
+        
+        # A recipe that failed on this chunk is dropped for the rest of the file
+        for recipe_name in list(pending):
+            if recipe_name not in translated_chunks:
+                entry = pending.pop(recipe_name)
+                entry['writer'].close()
+                if os.path.exists(entry['partial_path']):
+                    os.remove(entry['partial_path'])
+        if not pending:
+            return
+        
+        try:
+            started = time.perf_counter()
+            scored_chunks = score_chunk(translated_chunks, recipes, chunk['ref'].fillna('').astype(str).tolist())
+            seconds = time.perf_counter() - started
+            for recipe_name in scored_chunks:
+                get_metrics().record_stage('similarity', len(chunk), seconds / len(scored_chunks),
+                                           pair=f"{source_lang}-{target_lang}", recipe=recipe_name)
+        except Exception as e:
+            print(f"Error calculating similarity on {file} for {source_lang}-{target_lang}: {str(e)}")
+            for entry in pending.values():
+                entry['writer'].close()
+            return
+        
+        for recipe_name, df in scored_chunks.items():
+            pending[recipe_name]['writer'].write(df)
+    
+    for recipe_name, entry in pending.items():
+        entry['writer'].close()
+        os.replace(entry['partial_path'], entry['output_path'])
+        update_processing_state(state, entry['state_key'], translation_completed=True, similarity_completed=True)
+        entry['journal'].remove()
+        print(f"Completed {recipe_name} on {file} for {source_lang}-{target_lang}")
+
+def run_full_process(input_dir, output_dir, recipes, state, pairs=None, stream=None, chunk_size=None):
+    """Run the full process (translation + similarity), chunk by chunk if streaming"""
     print("Running full process...")
     print(f"Initial state: {len(state)} entries")
     
-    # Process each CSV file in the input directory
-    for file in os.listdir(input_dir):
-        if file.endswith(".csv"):
-            # Extract language pair from filename
-            source_lang, target_lang = extract_language_pair_from_filename(file)
-            if not source_lang or not target_lang:
-                print(f"Skipping {file}: filename should be in format 'source-target.csv'")
-                continue
-                
-            input_path = os.path.join(input_dir, file)
-            
-            # Create output directory for this language pair
-            lang_pair_dir = os.path.join(output_dir, f"{source_lang}-{target_lang}")
-            os.makedirs(lang_pair_dir, exist_ok=True)
-            
-            for recipe_name, recipe_module in recipes.items():
-                # Generate recipe-specific output filename
-                output_filename = get_output_filename(file, recipe_name)
-                output_path = os.path.join(lang_pair_dir, output_filename)
-                
-                # Check if this recipe has already processed this file
-                state_key = f"{source_lang}-{target_lang}/{file}/{recipe_name}"
-                if state.get(state_key, {}).get('similarity_completed', False):
-                    print(f"Skipping {recipe_name} for {file} ({source_lang}-{target_lang}) - already processed")
-                    continue
-                
-                print(f"Processing {input_path} with recipe {recipe_name} for {source_lang}-{target_lang}")
-                print(f"Output will be saved to {output_path}")
-                
-                try:
-                    result_df = process_csv(input_path, recipe_module, source_lang, target_lang)
-                    result_df.to_csv(output_path, index=False)
-                    
-                    # Update state
-                    state[state_key] = {
-                        'translation_completed': True,
-                        'similarity_completed': True
-                    }
-                    save_processing_state(state)
-                    
-                    print(f"Completed {recipe_name} on {file} for {source_lang}-{target_lang}")
-                except Exception as e:
-                    print(f"Error applying {recipe_name} to {file} for {source_lang}-{target_lang}: {str(e)}")
+    if stream is None:
+        stream = get_setting('streaming', 'enabled', False)
+    chunk_size = chunk_size or get_setting('streaming', 'chunk_size', 1000)
+    
+    for file, source_lang, target_lang in list_language_pair_files(input_dir, pairs):
+        with span(f"{source_lang}-{target_lang}"):
+            if stream:
+                stream_language_pair(input_dir, output_dir, file, source_lang, target_lang, recipes, state, chunk_size)
+            else:
+                # All recipes translate the file, then the shared similarity stage scores them together
+                with span("translate"):
+                    translate_language_pair(input_dir, output_dir, file, source_lang, target_lang, recipes, state)
+                with span("score"):
+                    score_language_pair(input_dir, output_dir, file, source_lang, target_lang, recipes, state)
     
+    print_cache_stats()
+    print_cassette_stats()
     print(f"Full process completed! Final state: {len(state)} entries")
 
 def display_menu():
@@ -266,15 +763,185 @@ def display_menu():
             print("\nExiting...")
             sys.exit(0)
 
-def reset_processing_state(state_file="processing_state.json"):
-    """Reset the processing state"""
-    if os.path.exists(state_file):
-        os.remove(state_file)
-        print("Processing state has been reset.")
-    else:
-        print("No state file found to reset.")
+def get_work_queue(output_dir):
+    """The lease-based work queue shared through the output directory"""
+    return WorkQueue(get_setting('queue', 'path', os.path.join(output_dir, ".queue.db")),
+                     lease_seconds=get_setting('queue', 'lease_seconds', 300))
 
-def main():
+def reset_work_queue(output_dir, pairs=None, recipe_names=None):
+    """Forget queued units, so the next queue run translates the reset files again"""
+    queue_path = get_setting('queue', 'path', os.path.join(output_dir, ".queue.db"))
+    if not os.path.exists(queue_path):
+        return
+    
+    def matches(task_id):
+        parts = task_id.split('/')
+        pair, recipe_name = parts[0], '/'.join(parts[2:-1])
+        return (not pairs or pair in pairs) and (not recipe_names or recipe_name in recipe_names)
+    
+    removed = get_work_queue(output_dir).remove(matches)
+    if removed:
+        print(f"Removed {removed} units from the work queue.")
+
+def reset_processing_state(state, pairs=None, recipe_names=None, output_dir="output"):
+    """Reset the processing state (and queued units), optionally only for some language pairs and recipes"""
+    reset_work_queue(output_dir, pairs, recipe_names)
+    if not pairs and not recipe_names:
+        if len(state):
+            state.clear()
+            print("Processing state has been reset.")
+        else:
+            print("No processing state found to reset.")
+        return
+    
+    removed = 0
+    for state_key, _ in state.items():
+        pair, _, recipe_name = state_key.split('/', 2)
+        if (not pairs or pair in pairs) and (not recipe_names or recipe_name in recipe_names):
+            state.delete(state_key)
+            removed += 1
+    print(f"Processing state has been reset for {removed} entries.")
+
+def parse_args(argv):
+    """Parse the non-interactive command line"""
+    parser = argparse.ArgumentParser(description="Translation benchmark pipeline. Run without arguments for the interactive menu.")
+    parser.add_argument('--input-dir', default="input", help="directory of 'source-target.csv' files")
+    parser.add_argument('--output-dir', default="output", help="directory for translated outputs")
+    parser.add_argument('--profile', action='store_true',
+                        help="time each stage and write a summary table and collapsed stacks")
+    parser.add_argument('--cprofile', action='store_true',
+                        help="like --profile, also running cProfile for each stage")
+    parser.add_argument('--profile-dir', help="where to write the profile (default: <output-dir>/profile)")
+    cassette_group = parser.add_mutually_exclusive_group()
+    cassette_group.add_argument('--record', action='store_true',
+                                help="log every API request and response to a JSONL cassette")
+    cassette_group.add_argument('--replay', action='store_true',
+                                help="answer API requests only from a recorded cassette, without the network")
+    parser.add_argument('--cassette', metavar='PATH', help="cassette file to record or replay (default: cassette.path)")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    
+    def add_selection_options(subparser, shardable=True):
+        subparser.add_argument('--pairs', type=lambda v: v.split(','),
+                               help="comma-separated language pairs, e.g. ewe-eng,twi-eng (default: all)")
+        subparser.add_argument('--recipes', type=lambda v: v.split(','),
+                               help="comma-separated recipe names (default: all)")
+        if shardable:
+            subparser.add_argument('--shard', type=shard_argument,
+                                   help="only do shard i of N of the work, e.g. 0/4")
+    
+    translate_parser = subparsers.add_parser('translate', help="translate pending rows")
+    add_selection_options(translate_parser)
+    translate_parser.add_argument('--chunk-size', type=int, default=500,
+                                  help="rows per work unit when sharding or queueing (default: 500)")
+    translate_parser.add_argument('--queue', action='store_true',
+                                  help="pull work units from the lease-based queue shared through the output directory")
+    translate_parser.add_argument('--workers', type=int,
+                                  help="concurrent queue workers in this process (default: scheduler.max_parallel_recipes)")
+    translate_parser.add_argument('--worker-id', help="name of this worker in the queue (default: host-pid)")
+    
+    score_parser = subparsers.add_parser('score', help="compute similarity scores")
+    add_selection_options(score_parser)
+    
+    run_parser = subparsers.add_parser('run', help="translate and score (the full process)")
+    add_selection_options(run_parser, shardable=False)
+    run_parser.add_argument('--stream', action='store_true', default=None,
+                            help="read, translate, score and write each file in chunks to keep memory flat")
+    run_parser.add_argument('--chunk-size', type=int,
+                            help="rows per streamed chunk (default: streaming.chunk_size)")
+    
+    export_parser = subparsers.add_parser('export-batch', help="write pending translation requests to a batch JSONL file")
+    add_selection_options(export_parser, shardable=False)
+    export_parser.add_argument('path', help="batch requests file to write")
+    
+    import_parser = subparsers.add_parser('import-batch', help="read batch results back into the outputs and state")
+    add_selection_options(import_parser, shardable=False)
+    import_parser.add_argument('path', help="batch results JSONL file")
+    
+    subparsers.add_parser('report', help="generate reports")
+    
+    subparsers.add_parser('calibrate', help="measure output/input length ratios for token budgeting")
+    
+    reset_parser = subparsers.add_parser('reset', help="reset processing state")
+    add_selection_options(reset_parser, shardable=False)
+    
+    return parser.parse_args(argv)
+
+def shard_argument(value):
+    try:
+        return parse_shard(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+def select_recipes(recipes, names):
+    """Restrict recipes to the given names, warning about unknown ones"""
+    if not names:
+        return recipes
+    for name in names:
+        if name not in recipes:
+            print(f"Unknown recipe: {name}")
+    return {name: recipe for name, recipe in recipes.items() if name in names}
+
+def run_cli(args):
+    """Run one pipeline command without the menu, profiling it if asked"""
+    if args.record:
+        use_cassette("record", args.cassette)
+    elif args.replay:
+        use_cassette("replay", args.cassette)
+    elif args.cassette:
+        use_cassette(None, args.cassette)
+    profiler = get_profiler()
+    if args.profile or args.cprofile or get_setting('profile', 'enabled', False):
+        profiler.start(use_cprofile=args.cprofile or get_setting('profile', 'cprofile', False))
+    with span(args.command):
+        run_command(args)
+    if profiler.enabled:
+        profiler.write(args.profile_dir or os.path.join(args.output_dir, "profile"))
+
+def run_command(args):
+    """Dispatch one parsed command"""
+    os.makedirs(args.output_dir, exist_ok=True)
+    
+    if args.command == 'report':
+        with span("import_reporting"):
+            from reporting import generate_report
+        generate_report(args.output_dir)
+        return
+    if args.command == 'calibrate':
+        calibrate_token_budget(args.output_dir)
+        return
+    
+    state = load_processing_state()
+    
+    if args.command == 'reset':
+        reset_processing_state(state, args.pairs, args.recipes, output_dir=args.output_dir)
+        return
+    
+    with span("load_recipes"):
+        recipes = select_recipes(load_recipes(), args.recipes)
+    if args.command == 'translate' and args.queue:
+        run_translation_queue(args.input_dir, args.output_dir, recipes, state, pairs=args.pairs,
+                              chunk_size=args.chunk_size, workers=args.workers, worker_id=args.worker_id)
+    elif args.command == 'translate':
+        run_translation_only(args.input_dir, args.output_dir, recipes, state,
+                             pairs=args.pairs, shard=args.shard, chunk_size=args.chunk_size)
+    elif args.command == 'run':
+        run_full_process(args.input_dir, args.output_dir, recipes, state,
+                         pairs=args.pairs, stream=args.stream, chunk_size=args.chunk_size)
+    elif args.command == 'score':
+        run_similarity_only(args.input_dir, args.output_dir, recipes, state,
+                            pairs=args.pairs, shard=args.shard)
+    elif args.command == 'export-batch':
+        export_translation_batch(args.input_dir, args.output_dir, recipes, state, args.path, pairs=args.pairs)
+    elif args.command == 'import-batch':
+        import_translation_batch(args.input_dir, args.output_dir, recipes, state, args.path, pairs=args.pairs)
+    export_metrics(args.output_dir)
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv:
+        run_cli(parse_args(argv))
+        return
+    
     # Define input and output directories
     input_dir = "input"
     output_dir = "output"
@@ -282,7 +949,12 @@ def main():
     # Create output directory if it doesn't exist
     os.makedirs(output_dir, exist_ok=True)
     
-    # Load recipes
+    # Stages are timed when [profile] enabled is set; the profile is rewritten after each run
+    profiler = get_profiler()
+    if get_setting('profile', 'enabled', False):
+        profiler.start(use_cprofile=get_setting('profile', 'cprofile', False))
+    
+    # Discover recipes (modules are imported lazily, when a stage needs them)
     recipes = load_recipes()
     
     # Load processing state
@@ -293,19 +965,29 @@ def main():
         choice = display_menu()
         
         if choice == "1":
-            run_translation_only(input_dir, output_dir, recipes, state)
+            with span("translate"):
+                run_translation_only(input_dir, output_dir, recipes, state)
+            export_metrics(output_dir)
         elif choice == "2":
-            run_similarity_only(input_dir, output_dir, recipes, state)
+            with span("score"):
+                run_similarity_only(input_dir, output_dir, recipes, state)
+            export_metrics(output_dir)
         elif choice == "3":
-            run_full_process(input_dir, output_dir, recipes, state)
+            with span("run"):
+                run_full_process(input_dir, output_dir, recipes, state)
+            export_metrics(output_dir)
         elif choice == "4":
-            generate_report(output_dir)
+            with span("report"):
+                # Plotly is only needed for reports, so it is imported here
+                from reporting import generate_report
+                generate_report(output_dir)
         elif choice == "5":
-            reset_processing_state()
-            state = {}  # Reset in-memory state
+            reset_processing_state(state, output_dir=output_dir)
         elif choice == "6":
             print("Exiting...")
             break
+        if profiler.enabled and choice in ["1", "2", "3", "4"]:
+            profiler.write(os.path.join(output_dir, "profile"))
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,73 @@
+import json
+import os
+
+# Endpoint named on each request line; batch APIs that take a single endpoint per job ignore it
+BATCH_ENDPOINT = "/v1/chat/completions"
+
+def make_custom_id(pair, file, recipe_name, row):
+    """Identifier of one row's request: pair/file/recipe/row"""
+    return f"{pair}/{file}/{recipe_name}/{row}"
+
+def parse_custom_id(custom_id):
+    """Split a custom_id back into (pair, file, recipe_name, row)"""
+    parts = custom_id.split('/')
+    if len(parts) < 4:
+        raise ValueError(f"custom_id should be pair/file/recipe/row, got {custom_id!r}")
+    # Recipe names may themselves contain slashes, so they take whatever is between file and row
+    return parts[0], parts[1], '/'.join(parts[2:-1]), int(parts[-1])
+
+class BatchWriter:
+    """Writes chat-completion requests as batch JSONL, one request per line.
+
+    Each line is {"custom_id", "method", "url", "body"}, where body is an
+    ordinary chat-completions request; this is the input format of the
+    common batch inference APIs, and easy to feed to a local runner.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._file = open(path, 'w', encoding='utf-8')
+
+    def write(self, custom_id, body):
+        line = {'custom_id': custom_id, 'method': "POST", 'url': BATCH_ENDPOINT, 'body': body}
+        self._file.write(json.dumps(line, ensure_ascii=False) + "\n")
+        self.count += 1
+
+    def close(self):
+        self._file.close()
+
+def result_text(entry):
+    """(response text, error) from one line of a batch results file.
+
+    Accepts the chat-completions batch output shape
+    ({"custom_id", "response": {"status_code", "body": <completion>}, "error"})
+    and the flat {"custom_id", "content"} a local runner can write.
+    """
+    if entry.get('error'):
+        return None, str(entry['error'])
+    if 'content' in entry:
+        return entry['content'], None
+    response = entry.get('response') or {}
+    status = response.get('status_code', 200)
+    if status != 200:
+        return None, f"HTTP {status}"
+    try:
+        return response['body']['choices'][0]['message']['content'], None
+    except (KeyError, IndexError, TypeError):
+        return None, "no completion in response"
+
+def read_results(path):
+    """Yield (custom_id, response text, error) for each line of a batch results file"""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                print(f"Skipping malformed line {line_number} of {path}")
+                continue
+            text, error = result_text(entry)
+            yield entry.get('custom_id'), text, error
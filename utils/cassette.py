@@ -0,0 +1,132 @@
+import json
+import os
+import threading
+import time
+
+from config import load_config
+from translation_cache import TranslationCache
+
+CASSETTE_MODES = ("off", "record", "replay")
+
+class CassetteMissError(Exception):
+    """Raised when replaying and a request has no recorded response"""
+
+class Cassette:
+    """JSONL log of chat-completion requests and their responses, for offline re-runs.
+
+    In record mode every answered request is appended as one line (model,
+    prompt, sampling parameters, response). In replay mode requests are
+    answered from those lines only and nothing is sent over the network; a
+    request that was never recorded is a miss, reported as it happens and
+    counted for the summary at the end of the run. Files with misses are not
+    finished, so the rows they are missing are tried again on the next run.
+    """
+
+    def __init__(self, path="cache/cassette.jsonl", mode="record"):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        self.path = path
+        self.mode = mode
+        self.hits = 0
+        self.misses = {}
+        self.recorded = 0
+        self._responses = {}
+        self._lock = threading.Lock()
+        self._file = None
+        if mode == "replay":
+            self._load()
+
+    @property
+    def replaying(self):
+        return self.mode == "replay"
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            raise FileNotFoundError(f"No cassette to replay at {self.path}; record one with --record first")
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # A crash can leave a half-written last line; ignore it
+                    continue
+                # Later recordings of the same request win
+                self._responses[entry['key']] = entry['response']
+        print(f"Replaying {len(self._responses)} recorded responses from {self.path}")
+
+    def record(self, model, prompt, request_params, response):
+        """Append one answered request to the cassette"""
+        entry = {
+            'key': TranslationCache.make_key(model, prompt, **request_params),
+            'model': model,
+            'prompt': prompt,
+            'params': request_params,
+            'response': response,
+            'recorded_at': time.time()
+        }
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock:
+            if self._file is None:
+                os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+                self._file = open(self.path, 'a', encoding='utf-8')
+            self._file.write(line)
+            self._file.flush()
+            self.recorded += 1
+
+    def replay(self, model, prompt, request_params):
+        """The recorded response to a request, or None (reported as a miss) if it was never recorded"""
+        response = self._responses.get(TranslationCache.make_key(model, prompt, **request_params))
+        with self._lock:
+            if response is None:
+                self.misses[model] = self.misses.get(model, 0) + 1
+            else:
+                self.hits += 1
+        if response is None:
+            print(f"[{model}] Cassette miss: no recorded response for prompt '{prompt[-80:]}'")
+        return response
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+_cassette = None
+_cassette_lock = threading.Lock()
+_override = None
+
+def use_cassette(mode, path=None):
+    """Override the [cassette] settings for this process, e.g. from --record/--replay (None keeps the mode)"""
+    global _override
+    if mode is not None and mode not in CASSETTE_MODES:
+        raise ValueError(f"Unknown cassette mode: {mode}")
+    _override = {'mode': mode, 'path': path}
+
+def get_cassette():
+    """The process-wide cassette, or None if recording and replay are off"""
+    global _cassette
+    settings = {**load_config().get('cassette', {})}
+    if _override is not None:
+        settings['mode'] = _override['mode'] or settings.get('mode', "off")
+        settings['path'] = _override['path'] or settings.get('path')
+    mode = settings.get('mode', "off")
+    if mode == "off":
+        return None
+    with _cassette_lock:
+        if _cassette is None:
+            _cassette = Cassette(settings.get('path') or os.path.join('cache', 'cassette.jsonl'), mode=mode)
+        return _cassette
+
+def print_cassette_stats():
+    """Print what the cassette recorded or, when replaying, its hits and misses per model"""
+    if _cassette is None:
+        return
+    if not _cassette.replaying:
+        print(f"Cassette: recorded {_cassette.recorded} responses to {_cassette.path}")
+        return
+    missed = sum(_cassette.misses.values())
+    print(f"Cassette replay: {_cassette.hits} hits, {missed} misses")
+    for model, count in sorted(_cassette.misses.items()):
+        print(f"  {model}: {count} requests not in {_cassette.path}")
+    if missed:
+        print("Files with misses were left unfinished; their missing rows are tried again on the next run")
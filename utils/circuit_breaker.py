@@ -0,0 +1,105 @@
+import threading
+import time
+
+from config import load_config
+
+# Errors that say the endpoint itself is unhealthy or gone, rather than this one request being bad
+BREAKER_STATUSES = {404, 410}
+
+class CircuitOpenError(Exception):
+    """Raised instead of sending a request to a model whose circuit is open"""
+
+class CircuitBreaker:
+    """Stops sending requests to a model after repeated failures, then probes it now and then.
+
+    Closed: requests flow; failure_threshold consecutive failures open the
+    circuit. Open: requests are refused at once until reset_seconds have
+    passed. Half-open: a single probe request is let through; success closes
+    the circuit, failure opens it again for twice as long (up to
+    max_reset_seconds).
+    """
+
+    CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+
+    def __init__(self, name, failure_threshold=5, reset_seconds=60, max_reset_seconds=900):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.base_reset_seconds = reset_seconds
+        self.max_reset_seconds = max_reset_seconds
+        self.reset_seconds = reset_seconds
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Whether a request may be sent now (in half-open state, only the one probe)"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.reset_seconds:
+                    return False
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+            if self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+            print(f"Circuit for {self.name} is half-open; sending a probe request")
+            return True
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                print(f"Circuit for {self.name} closed again")
+            self.state = self.CLOSED
+            self.failures = 0
+            self.reset_seconds = self.base_reset_seconds
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        """Count a failure; returns True if this opened the circuit"""
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN:
+                # The probe failed: stay away for longer this time
+                self.reset_seconds = min(self.reset_seconds * 2, self.max_reset_seconds)
+            elif self.state == self.OPEN or self.failures < self.failure_threshold:
+                return False
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+            self._probe_in_flight = False
+            print(f"Circuit for {self.name} opened after {self.failures} consecutive failures; "
+                  f"next probe in {self.reset_seconds:.0f}s")
+            return True
+
+    def retry_in(self):
+        """Seconds until the next probe is allowed (0 unless the circuit is open)"""
+        with self._lock:
+            if self.state != self.OPEN:
+                return 0.0
+            return max(self.reset_seconds - (time.monotonic() - self.opened_at), 0.0)
+
+def counts_as_failure(status):
+    """Whether an error with this HTTP status (None for network errors) says the endpoint is unhealthy"""
+    return status is None or status >= 500 or status in BREAKER_STATUSES
+
+# One breaker per model endpoint, shared by every recipe and thread in the process
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+def get_breaker(name):
+    """The shared circuit breaker for a model endpoint, configured from [circuit_breaker]"""
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            settings = load_config().get('circuit_breaker', {})
+            breaker = CircuitBreaker(
+                name,
+                failure_threshold=settings.get('failure_threshold', 5),
+                reset_seconds=settings.get('reset_seconds', 60),
+                max_reset_seconds=settings.get('max_reset_seconds', 900)
+            )
+            _breakers[name] = breaker
+        return breaker
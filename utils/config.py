@@ -0,0 +1,26 @@
+import os
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    import tomli as tomllib
+
+# PIPELINE_CONFIG points the pipeline at another settings file, e.g. for benchmarks
+CONFIG_FILE = os.environ.get('PIPELINE_CONFIG', os.path.join(os.path.dirname(__file__), '..', 'pipeline.toml'))
+
+_config_cache = {}
+
+def load_config(config_file=CONFIG_FILE):
+    """Load pipeline settings from pipeline.toml, or empty settings if the file is missing"""
+    config_file = os.path.abspath(config_file)
+    if config_file not in _config_cache:
+        if os.path.exists(config_file):
+            with open(config_file, 'rb') as f:
+                _config_cache[config_file] = tomllib.load(f)
+        else:
+            _config_cache[config_file] = {}
+    return _config_cache[config_file]
+
+def get_setting(section, key, default=None):
+    """Return a single setting from a section of pipeline.toml"""
+    return load_config().get(section, {}).get(key, default)
@@ -0,0 +1,129 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from config import load_config
+
+class LatencyTracker:
+    """Rolling window of recent successful request latencies for one model"""
+
+    def __init__(self, window=200):
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def quantile(self, fraction, min_samples=20):
+        """Latency below which `fraction` of recent requests finished, or None with too few samples"""
+        with self._lock:
+            if len(self._latencies) < min_samples:
+                return None
+            values = sorted(self._latencies)
+        return values[min(len(values) - 1, int(fraction * len(values)))]
+
+class Hedger:
+    """Sends a duplicate of a request that is slower than the model's observed p95, and takes whichever answers first.
+
+    Hedges are capped at max_ratio of the requests sent, and are only sent
+    when the rate limiter has a request slot free right now, so they never
+    delay regular requests under a tight RPM limit.
+    """
+
+    def __init__(self, quantile=0.95, min_samples=20, max_ratio=0.1, window=200, max_workers=64):
+        self.quantile = quantile
+        self.min_samples = min_samples
+        self.max_ratio = max_ratio
+        self.window = window
+        self._trackers = {}
+        self._counts = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="hedge")
+
+    def tracker(self, name):
+        with self._lock:
+            if name not in self._trackers:
+                self._trackers[name] = LatencyTracker(self.window)
+            return self._trackers[name]
+
+    def _claim_hedge(self, name):
+        """Count a hedge against the budget of a model, if the budget allows one more"""
+        with self._lock:
+            requests, hedges = self._counts.get(name, (0, 0))
+            if hedges + 1 > self.max_ratio * requests:
+                return False
+            self._counts[name] = (requests, hedges + 1)
+            return True
+
+    def hedge_rate(self, name):
+        with self._lock:
+            requests, hedges = self._counts.get(name, (0, 0))
+        return hedges / requests if requests else 0.0
+
+    def call(self, name, send, can_hedge=lambda: True):
+        """Run send() and return (result, hedged, hedge_won).
+
+        If it hasn't answered by the model's p95 latency, and can_hedge()
+        grants a request slot, send() runs a second time in parallel. The
+        first answer wins; if one copy fails, the other's result is used. The
+        losing request is left to finish in the background.
+        """
+        with self._lock:
+            requests, hedges = self._counts.get(name, (0, 0))
+            self._counts[name] = (requests + 1, hedges)
+
+        tracker = self.tracker(name)
+        threshold = tracker.quantile(self.quantile, self.min_samples)
+
+        def timed_send():
+            started = time.perf_counter()
+            result = send()
+            tracker.record(time.perf_counter() - started)
+            return result
+
+        primary = self._executor.submit(timed_send)
+        if threshold is None:
+            return primary.result(), False, False
+
+        done, _ = wait([primary], timeout=threshold)
+        if done or not self._claim_hedge(name):
+            return primary.result(), False, False
+        if not can_hedge():
+            # No free request slot: give the hedge back to the budget and keep waiting
+            with self._lock:
+                requests, hedges = self._counts[name]
+                self._counts[name] = (requests, hedges - 1)
+            return primary.result(), False, False
+
+        hedge = self._executor.submit(timed_send)
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result(), True, future is hedge
+                error = future.exception()
+        raise error
+
+_hedger = None
+_hedger_lock = threading.Lock()
+
+def get_hedger():
+    """The shared hedger from [hedging] in pipeline.toml, or None if hedging is off"""
+    global _hedger
+    settings = load_config().get('hedging', {})
+    if not settings.get('enabled', False):
+        return None
+    with _hedger_lock:
+        if _hedger is None:
+            _hedger = Hedger(
+                quantile=settings.get('quantile', 0.95),
+                min_samples=settings.get('min_samples', 20),
+                max_ratio=settings.get('max_hedge_ratio', 0.1),
+                window=settings.get('window', 200),
+                max_workers=settings.get('max_workers', 64)
+            )
+        return _hedger
@@ -0,0 +1,194 @@
+import json
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from config import get_setting
+
+# Upper bounds (seconds) of the histogram buckets exported to Prometheus
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+# Observations kept per histogram for percentiles; beyond this a uniform sample is kept
+MAX_SAMPLES = 10000
+
+def _label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+def _render_labels(labels):
+    if not labels:
+        return ""
+    escaped = [(k, str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')) for k, v in labels]
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+class Histogram:
+    """Count, sum, bucket counts and a bounded sample of observations for percentiles"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.bucket_counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.samples = []
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.bucket_counts[i] += 1
+        if len(self.samples) < MAX_SAMPLES:
+            self.samples.append(value)
+        else:
+            # Reservoir sampling keeps every observation equally likely to be in the sample
+            slot = random.randrange(self.count)
+            if slot < MAX_SAMPLES:
+                self.samples[slot] = value
+
+    def summary(self):
+        values = sorted(self.samples)
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'p50': _percentile(values, 0.50),
+            'p95': _percentile(values, 0.95),
+            'p99': _percentile(values, 0.99),
+            'max': values[-1] if values else None
+        }
+
+class MetricsRegistry:
+    """Thread-safe counters, gauges and histograms labelled by pair, recipe and stage (or any other labels).
+
+    Metrics are kept in memory for the run and exported at the end as JSON
+    and as a Prometheus textfile.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self.started = time.time()
+
+    def set(self, name, value, **labels):
+        """Set a gauge to its current value"""
+        key = _label_key(labels)
+        with self._lock:
+            self.gauges.setdefault(name, {})[key] = value
+
+    def inc(self, name, value=1, **labels):
+        """Add to a counter"""
+        key = _label_key(labels)
+        with self._lock:
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        """Record one observation in a histogram"""
+        key = _label_key(labels)
+        with self._lock:
+            series = self.histograms.setdefault(name, {})
+            if key not in series:
+                series[key] = Histogram()
+            series[key].observe(value)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """Observe how long the block takes, in seconds"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def record_stage(self, stage, rows, seconds, **labels):
+        """Count the rows a stage processed and the time it took, for throughput"""
+        self.inc('stage_rows_total', rows, stage=stage, **labels)
+        self.inc('stage_seconds_total', seconds, stage=stage, **labels)
+
+    def snapshot(self):
+        """All metrics as plain data, with rows per second for every labelled stage"""
+        with self._lock:
+            counters = {name: [{'labels': dict(key), 'value': value} for key, value in series.items()]
+                        for name, series in self.counters.items()}
+            gauges = {name: [{'labels': dict(key), 'value': value} for key, value in series.items()]
+                      for name, series in self.gauges.items()}
+            histograms = {name: [{'labels': dict(key), **histogram.summary()} for key, histogram in series.items()]
+                          for name, series in self.histograms.items()}
+            seconds = self.counters.get('stage_seconds_total', {})
+            throughput = [
+                {'labels': dict(key), 'rows': rows, 'seconds': seconds[key],
+                 'rows_per_second': rows / seconds[key] if seconds[key] else None}
+                for key, rows in self.counters.get('stage_rows_total', {}).items() if key in seconds
+            ]
+        return {
+            'started': self.started,
+            'finished': time.time(),
+            'counters': counters,
+            'gauges': gauges,
+            'histograms': histograms,
+            'throughput': throughput
+        }
+
+    def to_prometheus(self, prefix="pipeline_"):
+        """Render the metrics in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            for name, series in sorted(self.counters.items()):
+                lines.append(f"# TYPE {prefix}{name} counter")
+                for key, value in series.items():
+                    lines.append(f"{prefix}{name}{_render_labels(key)} {value}")
+            for name, series in sorted(self.gauges.items()):
+                lines.append(f"# TYPE {prefix}{name} gauge")
+                for key, value in series.items():
+                    lines.append(f"{prefix}{name}{_render_labels(key)} {value}")
+            for name, series in sorted(self.histograms.items()):
+                lines.append(f"# TYPE {prefix}{name} histogram")
+                for key, histogram in series.items():
+                    for bound, count in zip(histogram.buckets, histogram.bucket_counts):
+                        lines.append(f"{prefix}{name}_bucket{_render_labels(key + (('le', bound),))} {count}")
+                    lines.append(f"{prefix}{name}_bucket{_render_labels(key + (('le', '+Inf'),))} {histogram.count}")
+                    lines.append(f"{prefix}{name}_sum{_render_labels(key)} {histogram.sum}")
+                    lines.append(f"{prefix}{name}_count{_render_labels(key)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.gauges.clear()
+            self.histograms.clear()
+            self.started = time.time()
+
+_registry = MetricsRegistry()
+
+def get_metrics():
+    """The process-wide metrics registry"""
+    return _registry
+
+def _write_atomic(path, text):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    # Replaced in one step so a textfile collector never reads a half-written file
+    os.replace(temp_path, path)
+
+def export_metrics(output_dir="output"):
+    """Write the run's metrics to the JSON file and Prometheus textfile set in [metrics], then reset them"""
+    if not get_setting('metrics', 'enabled', True):
+        return
+    registry = get_metrics()
+    json_path = get_setting('metrics', 'json_path', os.path.join(output_dir, "metrics.json"))
+    prometheus_path = get_setting('metrics', 'prometheus_path', os.path.join(output_dir, "metrics.prom"))
+    if json_path:
+        _write_atomic(json_path, json.dumps(registry.snapshot(), indent=2))
+    if prometheus_path:
+        _write_atomic(prometheus_path, registry.to_prometheus())
+    print(f"Metrics written to {', '.join(p for p in (json_path, prometheus_path) if p)}")
+    registry.reset()
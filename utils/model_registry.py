@@ -0,0 +1,115 @@
+import gc
+import threading
+from collections import OrderedDict
+
+from config import load_config
+from profiler import span
+
+try:
+    import psutil
+except ImportError:  # Memory-pressure checks are skipped without psutil
+    psutil = None
+
+def load_sentence_transformer(name):
+    """Default loader: a sentence-transformers embedding model"""
+    from sentence_transformers import SentenceTransformer
+    print(f"Loading embedding model {name}...")
+    return SentenceTransformer(name)
+
+class ModelRegistry:
+    """Process-wide registry that loads each model once, on first request, and shares it.
+
+    Models are kept in least-recently-used order. Before another model is
+    loaded, older ones are released if more than max_loaded would be held or
+    if available system memory is below min_available_mb.
+    """
+
+    def __init__(self, max_loaded=2, min_available_mb=1024):
+        self.max_loaded = max_loaded
+        self.min_available_mb = min_available_mb
+        self._models = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks = {}
+
+    def get(self, name, loader=load_sentence_transformer):
+        """Return the named model, loading it if it isn't held yet"""
+        with self._lock:
+            if name in self._models:
+                self._models.move_to_end(name)
+                return self._models[name]
+            load_lock = self._load_locks.setdefault(name, threading.Lock())
+
+        # Only one thread loads a given model; others asking for it wait and share it
+        with load_lock:
+            with self._lock:
+                if name in self._models:
+                    self._models.move_to_end(name)
+                    return self._models[name]
+            self._make_room()
+            with span("model_load"):
+                model = loader(name)
+            with self._lock:
+                self._models[name] = model
+            return model
+
+    def release(self, name):
+        """Drop the registry's reference to a model so its memory can be reclaimed"""
+        with self._lock:
+            model = self._models.pop(name, None)
+        if model is not None:
+            print(f"Released model {name}")
+            del model
+            _free_memory()
+
+    def release_all(self):
+        for name in list(self._models):
+            self.release(name)
+
+    def loaded(self):
+        """Names of the models currently held, least recently used first"""
+        with self._lock:
+            return list(self._models)
+
+    def _make_room(self):
+        while True:
+            with self._lock:
+                if not self._models:
+                    return
+                oldest = next(iter(self._models))
+                too_many = len(self._models) >= self.max_loaded
+            if not too_many and not _low_on_memory(self.min_available_mb):
+                return
+            self.release(oldest)
+
+def _low_on_memory(min_available_mb):
+    if psutil is None:
+        return False
+    return psutil.virtual_memory().available < min_available_mb * 1024 * 1024
+
+def _free_memory():
+    gc.collect()
+    try:
+        import torch
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+    except ImportError:
+        pass
+
+_registry = None
+_registry_lock = threading.Lock()
+
+def get_registry():
+    """Return the process-wide model registry, configured from pipeline.toml"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            settings = load_config().get('embedding_models', {})
+            _registry = ModelRegistry(
+                max_loaded=settings.get('max_loaded', 2),
+                min_available_mb=settings.get('min_available_memory_mb', 1024)
+            )
+        return _registry
+
+def get_model(name, loader=load_sentence_transformer):
+    """Shortcut for get_registry().get(name)"""
+    return get_registry().get(name, loader=loader)
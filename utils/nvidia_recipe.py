@@ -0,0 +1,476 @@
+import os
+import re
+import threading
+import time
+
+import httpx
+import numpy as np
+from dotenv import load_dotenv
+from openai import OpenAI
+
+from cassette import CassetteMissError, get_cassette
+from circuit_breaker import CircuitOpenError, counts_as_failure, get_breaker
+from config import load_config
+from hedging import get_hedger
+from language_mapping import get_language_name
+from metrics import get_metrics
+from profiler import span
+from model_registry import get_model
+from rate_limiter import get_request_buckets, try_acquire_all
+from retry import get_retry_policy, status_code
+from similarity import encode_texts
+from token_budget import get_token_budget
+from translation_cache import get_translation_cache
+from translation_engine import translate_rows
+
+# Load environment variables from .env file
+load_dotenv()
+
+DEFAULT_BASE_URL = "https://integrate.api.nvidia.com/v1"
+DEFAULT_SIMILARITY_MODEL = "sentence-transformers/all-mpnet-base-v2"
+
+# Sampling parameters sent with every request unless a recipe overrides them
+DEFAULT_PARAMS = {
+    "temperature": 0.3,
+    "top_p": 0.95,
+    "max_tokens": 2024
+}
+
+# One OpenAI client (and so one keep-alive connection pool) per endpoint and key,
+# shared by every model that talks to it
+_clients = {}
+_clients_lock = threading.Lock()
+
+def get_client(base_url=DEFAULT_BASE_URL, api_key_env="NVIDIA_BUILD_API_KEY"):
+    """Return the shared OpenAI-compatible client for an endpoint, creating it on first use"""
+    with _clients_lock:
+        client = _clients.get((base_url, api_key_env))
+        if client is None:
+            settings = load_config().get('engine', {})
+            pool_size = settings.get('pool_connections', 32)
+            http_client = httpx.Client(
+                limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+                timeout=settings.get('timeout_seconds', 120)
+            )
+            # Retries are left to the shared retry policy, so the client must not add its own
+            client = OpenAI(base_url=base_url, api_key=os.getenv(api_key_env), http_client=http_client,
+                            max_retries=0)
+            _clients[(base_url, api_key_env)] = client
+        return client
+
+def extract_translation(response_text):
+    """Extract text from brackets if present, otherwise use as-is"""
+    match = re.search(r'\[(.*?)\]', response_text, flags=re.S)
+    if match:
+        return match.group(1).strip()
+    return response_text.strip()
+
+def answer_closed(response_text):
+    """Whether a (partial) response already holds a complete bracketed answer"""
+    opening = response_text.find('[')
+    return opening != -1 and response_text.find(']', opening + 1) != -1
+
+def pack_prompt(texts, source_lang_name, target_lang_name):
+    """Prompt asking for several numbered sentences to be translated in one answer"""
+    # Each sentence must stay on its own numbered line
+    numbered = "\n".join(f"{n}. {' '.join(str(text).split())}" for n, text in enumerate(texts, 1))
+    return (f"Translate each of the following {len(texts)} numbered {source_lang_name} sentences into {target_lang_name}. "
+            f"Reply with exactly {len(texts)} lines, in the same order, each being the sentence number followed by "
+            f"ONLY its translation inside square brackets, like this:\n1. [translation]\n"
+            f"Do not merge, split or skip sentences.\n\n{numbered}")
+
+def parse_packed(response_text, count):
+    """Translations from a packed answer, in order, or None unless there is exactly one non-empty answer per number 1..count"""
+    answers = {}
+    for match in re.finditer(r'^\s*(\d+)\s*[.):]\s*\[(.*)\]\s*$', response_text, flags=re.M):
+        number, translation = int(match.group(1)), match.group(2).strip()
+        if number in answers or not translation:
+            return None
+        answers[number] = translation
+    if sorted(answers) != list(range(1, count + 1)):
+        return None
+    return [answers[n] for n in range(1, count + 1)]
+
+class NvidiaRecipe:
+    """A translation recipe defined by a manifest entry instead of its own module.
+
+    Every instance shares the same pooled client, rate-limit buckets, response
+    cache and embedding models, so adding a model is one entry in
+    pipeline.toml rather than another copy of a recipe file.
+    """
+
+    def __init__(self, name, model, params=None, requests_per_minute=None, max_concurrency=8,
+                 similarity_model_name=DEFAULT_SIMILARITY_MODEL, base_url=DEFAULT_BASE_URL,
+                 api_key_env="NVIDIA_BUILD_API_KEY", pack_size=1, stream=False, budget_overhead_tokens=0):
+        self.name = name
+        self.model = model
+        self.request_params = {**DEFAULT_PARAMS, **(params or {})}
+        self.requests_per_minute = requests_per_minute
+        self.max_concurrency = max_concurrency
+        self.similarity_model_name = similarity_model_name
+        self.base_url = base_url
+        self.api_key_env = api_key_env
+        # Sentences sent per request; above 1, numbered sentences are packed into one prompt
+        self.pack_size = pack_size
+        # Stream responses and stop reading once the bracketed answer has closed
+        self.stream = stream
+        # Extra tokens on top of the estimated answer, e.g. for a reasoning model's thinking
+        self.budget_overhead_tokens = budget_overhead_tokens
+
+    @classmethod
+    def from_manifest(cls, name, entry):
+        """Build a recipe from a [recipes.<name>] entry, falling back to the [engine] defaults"""
+        defaults = load_config().get('engine', {})
+        return cls(
+            name,
+            entry['model'],
+            params={**defaults.get('params', {}), **entry.get('params', {})},
+            requests_per_minute=entry.get('requests_per_minute', defaults.get('requests_per_minute')),
+            max_concurrency=entry.get('max_concurrency', defaults.get('max_concurrency', 8)),
+            similarity_model_name=entry.get('similarity_model', DEFAULT_SIMILARITY_MODEL),
+            base_url=entry.get('base_url', defaults.get('base_url', DEFAULT_BASE_URL)),
+            api_key_env=entry.get('api_key_env', defaults.get('api_key_env', "NVIDIA_BUILD_API_KEY")),
+            pack_size=entry.get('pack_size', defaults.get('pack_size', 1)),
+            stream=entry.get('stream', defaults.get('stream', False)),
+            budget_overhead_tokens=entry.get('budget_overhead_tokens', 0)
+        )
+
+    def _complete(self, prompt, labels, max_retries=None, validate=None, answer_complete=None, max_tokens=None):
+        """Send one prompt (answering from the cache when possible) and return the response text, or None.
+
+        Rate limiting, retries and metrics are handled here for every kind of
+        request. Only responses that pass validate (non-empty by default) are
+        cached, so an answer that had to be discarded isn't served again.
+        In streaming mode, answer_complete is checked as text arrives and the
+        stream is closed as soon as it returns True.
+        max_tokens, if given, is a tighter budget than the recipe's own; an
+        answer cut off by it is requested again with twice the budget, up to
+        the recipe's max_tokens.
+        With a cassette in record mode every answer is also logged to it; in
+        replay mode the cassette answers instead of the cache and the network,
+        and a request it has no answer for raises CassetteMissError.
+        """
+        validate = validate or bool
+        is_complete = answer_complete or validate
+        metrics = get_metrics()
+        ceiling = self.request_params.get('max_tokens')
+        if max_tokens is None or ceiling is None:
+            max_tokens = ceiling
+
+        # When replaying a cassette, only recorded responses are used and nothing goes over the network
+        cassette = get_cassette()
+        if cassette is not None and cassette.replaying:
+            response_text = cassette.replay(self.model, prompt, self.request_params)
+            metrics.inc('cassette_replays_total', outcome='hit' if response_text is not None else 'miss', **labels)
+            if response_text is None:
+                raise CassetteMissError(f"no recorded response for {self.model}")
+            return response_text
+
+        # Identical requests are answered from the on-disk cache
+        cache = get_translation_cache()
+        if cache is not None:
+            cache_key = cache.make_key(self.model, prompt, **self.request_params)
+            cached_response = cache.get(cache_key)
+            if cached_response is not None and validate(cached_response):
+                metrics.inc('cache_hits_total', **labels)
+                if cassette is not None:
+                    cassette.record(self.model, prompt, self.request_params, cached_response)
+                return cached_response
+
+        # Per-model and per-key buckets are shared with every other recipe in this process
+        buckets = get_request_buckets(self.model, self.api_key_env, rpm=self.requests_per_minute)
+        client = get_client(self.base_url, self.api_key_env)
+        policy = get_retry_policy()
+        breaker = get_breaker(self.model)
+
+        attempt = 0
+        while True:
+            # A model that keeps failing is skipped at once instead of burning retries on every row;
+            # the error stops this recipe's run, and its rows are picked up again on a later run
+            if not breaker.allow():
+                metrics.inc('circuit_rejections_total', **labels)
+                raise CircuitOpenError(f"circuit for {self.model} is open after repeated failures; "
+                                       f"next probe in {breaker.retry_in():.0f}s")
+            # The cache key above uses the recipe's parameters, so a budgeted answer is shared with unbudgeted runs
+            request_params = {**self.request_params, 'max_tokens': max_tokens} if max_tokens is not None else self.request_params
+            try:
+                if attempt:
+                    metrics.inc('retries_total', **labels)
+
+                # Every attempt, including retries, waits for a request slot
+                with metrics.timer('rate_limit_wait_seconds', **labels), span("rate_limit_wait"):
+                    for bucket in buckets:
+                        bucket.acquire()
+
+                def send():
+                    with span("http_request"):
+                        if self.stream:
+                            return self._stream_completion(client, prompt, labels, answer_complete, request_params)
+                        completion = client.chat.completions.create(
+                            model=self.model,
+                            messages=[
+                                {
+                                    "role": "user",
+                                    "content": prompt
+                                }
+                            ],
+                            stream=False,
+                            **request_params
+                        )
+                    if completion.usage is not None:
+                        metrics.inc('tokens_total', completion.usage.prompt_tokens, kind='prompt', **labels)
+                        metrics.inc('tokens_total', completion.usage.completion_tokens, kind='completion', **labels)
+
+                    # Directly get the response content
+                    return completion.choices[0].message.content, completion.choices[0].finish_reason
+
+                request_started = time.perf_counter()
+                hedger = get_hedger()
+                if hedger is None:
+                    response_text, finish_reason = send()
+                else:
+                    # A hedge is a real request, so it needs a free slot in every bucket
+                    (response_text, finish_reason), hedged, hedge_won = hedger.call(
+                        self.model, send, can_hedge=lambda: try_acquire_all(buckets))
+                    if hedged:
+                        metrics.inc('hedges_total', **labels)
+                    if hedge_won:
+                        metrics.inc('hedge_wins_total', **labels)
+                    metrics.set('hedge_rate', hedger.hedge_rate(self.model), model=self.model)
+
+                metrics.observe('request_seconds', time.perf_counter() - request_started, **labels)
+                truncated = (finish_reason == 'length' and max_tokens is not None and max_tokens < ceiling
+                             and not is_complete(response_text or ""))
+                # Checked before counting the request, so an empty answer is only counted once, as an error
+                if response_text is None and not truncated:
+                    raise ValueError("Response has no content")
+                metrics.inc('requests_total', outcome='ok', **labels)
+                breaker.record_success()
+                if truncated:
+                    # Cut off by the budget before the answer was complete: ask again with more room.
+                    # This isn't a failure, so it doesn't use up a retry.
+                    max_tokens = min(ceiling, max_tokens * 2)
+                    metrics.inc('truncated_retries_total', **labels)
+                    print(f"[{self.model}] Answer cut off by the token budget; retrying with max_tokens={max_tokens}")
+                    continue
+                if cache is not None and validate(response_text):
+                    cache.put(cache_key, response_text)
+                if cassette is not None:
+                    cassette.record(self.model, prompt, self.request_params, response_text)
+                return response_text
+
+            except Exception as e:
+                status = status_code(e)
+                metrics.inc('requests_total', outcome='error', **labels)
+                metrics.inc('errors_total', status=status or 'network', **labels)
+                if isinstance(e, ValueError) or not counts_as_failure(status):
+                    # Throttled, rejected or an empty answer, but the endpoint answered, so it is up
+                    breaker.record_success()
+                elif breaker.record_failure():
+                    metrics.inc('circuit_opened_total', model=self.model)
+                delay = policy.delay(attempt, e, max_attempts=max_retries)
+                if delay is None:
+                    reason = "not retryable" if not policy.is_retryable(e) else f"after {attempt+1} attempts"
+                    print(f"[{self.model}] Giving up on prompt '{prompt[-80:]}' ({reason}): {str(e)}")
+                    return None
+
+                print(f"[{self.model}] Attempt {attempt+1} failed for prompt '{prompt[-80:]}': {str(e)}; retrying in {delay:.1f}s")
+                if status == 429:
+                    # Throttling applies to everyone on this model or key, so every worker backs off,
+                    # and the wait happens in bucket.acquire() before the next attempt
+                    for bucket in buckets:
+                        bucket.pause(delay)
+                else:
+                    with span("retry_sleep"):
+                        time.sleep(delay)
+                attempt += 1
+
+    def _stream_completion(self, client, prompt, labels, answer_complete=None, request_params=None):
+        """Stream a completion and stop reading once answer_complete(text so far) is True.
+
+        Returns the text and the finish reason (None when the stream was cut off).
+        """
+        metrics = get_metrics()
+        request_started = time.perf_counter()
+        stream = client.chat.completions.create(
+            model=self.model,
+            messages=[
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ],
+            stream=True,
+            **(request_params or self.request_params)
+        )
+        parts = []
+        chunks = 0
+        finish_reason = None
+        try:
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].finish_reason:
+                    finish_reason = chunk.choices[0].finish_reason
+                if getattr(chunk, 'usage', None) is not None:
+                    # Some providers report usage in the last chunk, i.e. when the answer never completed early
+                    metrics.inc('tokens_total', chunk.usage.prompt_tokens, kind='prompt', **labels)
+                    metrics.inc('tokens_total', chunk.usage.completion_tokens, kind='completion', **labels)
+                if not chunk.choices or not chunk.choices[0].delta.content:
+                    continue
+                if not parts:
+                    metrics.observe('first_token_seconds', time.perf_counter() - request_started, **labels)
+                parts.append(chunk.choices[0].delta.content)
+                chunks += 1
+                if answer_complete is not None and answer_complete("".join(parts)):
+                    # Closing the stream stops the generation we would otherwise wait for and pay for;
+                    # the chunks read so far stand in for the completion tokens
+                    metrics.inc('stream_cutoffs_total', **labels)
+                    metrics.inc('streamed_chunks_total', chunks, **labels)
+                    return "".join(parts), None
+        finally:
+            stream.close()
+        metrics.inc('streamed_chunks_total', chunks, **labels)
+        return ("".join(parts) if parts else None), finish_reason
+
+    def _token_budget(self, pair, texts):
+        """Tight max_tokens for translating texts, or None to use the recipe's own"""
+        budget = get_token_budget()
+        if budget is None or self.request_params.get('max_tokens') is None:
+            return None
+        return budget.max_tokens_for(pair, texts, ceiling=self.request_params['max_tokens'],
+                                     overhead_tokens=self.budget_overhead_tokens)
+
+    def translation_prompt(self, text, source_lang, target_lang):
+        """Prompt asking for the translation of one text"""
+        source_lang_name = get_language_name(source_lang)
+        target_lang_name = get_language_name(target_lang)
+        return f"Translate the following {source_lang_name} text into {target_lang_name} and return ONLY the translation inside square brackets:\n\n{text}"
+
+    def translate_text_with_nvidia(self, text, source_lang, target_lang, max_retries=None):
+        """Translate text using NVIDIA Build API via OpenAI client (max_retries attempts, default from [retry])"""
+        prompt = self.translation_prompt(text, source_lang, target_lang)
+
+        metrics = get_metrics()
+        labels = {'pair': f"{source_lang}-{target_lang}", 'recipe': self.name, 'stage': 'translation'}
+        try:
+            response_text = self._complete(prompt, labels, max_retries=max_retries,
+                                           answer_complete=answer_closed,
+                                           max_tokens=self._token_budget(labels['pair'], [text]))
+        except CassetteMissError:
+            # Not attempted rather than failed: the row stays pending
+            return None
+        if response_text is None:
+            metrics.inc('failed_rows_total', **labels)
+            return ""
+
+        translation = extract_translation(response_text)
+        if not translation:
+            metrics.inc('empty_translations_total', **labels)
+        return translation
+
+    def translate_batch_with_nvidia(self, texts, source_lang, target_lang):
+        """Translate several texts in one request, falling back to one request per text if the answer doesn't line up"""
+        source_lang_name = get_language_name(source_lang)
+        target_lang_name = get_language_name(target_lang)
+
+        prompt = pack_prompt(texts, source_lang_name, target_lang_name)
+
+        metrics = get_metrics()
+        labels = {'pair': f"{source_lang}-{target_lang}", 'recipe': self.name, 'stage': 'translation'}
+        is_complete = lambda response: parse_packed(response, len(texts)) is not None
+        try:
+            response_text = self._complete(prompt, labels, validate=is_complete, answer_complete=is_complete,
+                                           max_tokens=self._token_budget(labels['pair'], texts))
+        except CassetteMissError:
+            # The cassette may have been recorded without packing
+            response_text = None
+        translations = parse_packed(response_text, len(texts)) if response_text is not None else None
+        if translations is not None:
+            metrics.inc('packed_rows_total', len(texts), **labels)
+            return translations
+
+        print(f"[{self.model}] Packed answer for {len(texts)} sentences didn't line up; translating them one by one")
+        metrics.inc('pack_fallbacks_total', **labels)
+        return [self.translate_text_with_nvidia(text, source_lang, target_lang) for text in texts]
+
+    def batch_request(self, text, source_lang, target_lang):
+        """Chat-completions request body translating one text, for an offline batch job"""
+        return {
+            'model': self.model,
+            'messages': [
+                {
+                    "role": "user",
+                    "content": self.translation_prompt(text, source_lang, target_lang)
+                }
+            ],
+            **self.request_params
+        }
+
+    def batch_translation(self, response_text):
+        """The translation in a batch job's response text ("" if there is none)"""
+        return extract_translation(response_text) if response_text else ""
+
+    def translation_only(self, df, source_lang, target_lang, journal=None):
+        """Only perform translation without similarity calculation (resuming from journal if given)"""
+        print(f"Translation: NVIDIA Build API ({self.model})")
+        buckets = get_request_buckets(self.model, self.api_key_env, rpm=self.requests_per_minute)
+        print(f"Rate limiting: {', '.join(f'{b.rpm} requests per minute' for b in buckets)}, up to {self.max_concurrency} requests in flight")
+        if self.pack_size > 1:
+            print(f"Packing up to {self.pack_size} sentences per request")
+
+        result_df = df.copy()
+
+        translations = translate_rows(
+            result_df,
+            lambda text: self.translate_text_with_nvidia(text, source_lang, target_lang),
+            max_concurrency=self.max_concurrency,
+            label=self.model,
+            journal=journal,
+            batch_fn=lambda texts: self.translate_batch_with_nvidia(texts, source_lang, target_lang),
+            batch_size=self.pack_size
+        )
+        missing = sum(translation is None for translation in translations)
+        if missing:
+            # Finishing the output now would write blanks for rows the cassette just doesn't have
+            raise CassetteMissError(f"{missing}/{len(translations)} rows have no recorded response in the cassette; "
+                                    f"the rows it had are journaled")
+        result_df['translated'] = translations
+
+        print("Translation process completed!")
+        return result_df
+
+    def similarity_only(self, df, batch_size=32):
+        """Only calculate similarity between translated text and reference using batch processing"""
+        print("Calculating similarity scores with batch processing...")
+
+        result_df = df.copy()
+
+        # Check if 'translated' column exists
+        if 'translated' not in result_df.columns:
+            print("Error: No 'translated' column found in the DataFrame")
+            return result_df
+
+        # Check if 'ref' column exists
+        if 'ref' not in result_df.columns:
+            print("Error: No 'ref' column found in the DataFrame")
+            return result_df
+
+        similarity_model = get_model(self.similarity_model_name)
+        with span("embedding"):
+            embeddings_translated = encode_texts(similarity_model, result_df['translated'].fillna('').astype(str).tolist(), batch_size)
+            embeddings_ref = encode_texts(similarity_model, result_df['ref'].fillna('').astype(str).tolist(), batch_size)
+
+        # Embeddings are normalised, so the row-wise dot product is the cosine similarity
+        result_df['similarity_score'] = np.sum(embeddings_translated * embeddings_ref, axis=1)
+
+        print("Similarity calculation completed!")
+        return result_df
+
+    def process_dataframe(self, df, source_lang, target_lang, journal=None):
+        """Full processing function (translation + similarity)"""
+        # First do translation
+        df = self.translation_only(df, source_lang, target_lang, journal=journal)
+
+        # Then calculate similarity
+        df = self.similarity_only(df)
+
+        return df
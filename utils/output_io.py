@@ -0,0 +1,130 @@
+import os
+import tempfile
+
+import pandas as pd
+
+from config import get_setting
+
+# File extension for each supported output format
+OUTPUT_EXTENSIONS = {
+    'csv': '.csv',
+    'parquet': '.parquet'
+}
+
+def get_output_format():
+    """Output format from pipeline.toml: 'csv' (default) or 'parquet'"""
+    output_format = get_setting('output', 'format', 'csv')
+    if output_format not in OUTPUT_EXTENSIONS:
+        raise ValueError(f"Unknown output format '{output_format}', expected one of {', '.join(OUTPUT_EXTENSIONS)}")
+    return output_format
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("Parquet output needs pyarrow: pip install pyarrow")
+    return pyarrow
+
+def compact_output(df):
+    """Drop junk columns and shrink dtypes: float32 scores, dictionary-encoded source"""
+    df = df.drop(columns=[c for c in df.columns if str(c).startswith('Unnamed:')])
+    if 'similarity_score' in df.columns:
+        df['similarity_score'] = df['similarity_score'].astype('float32')
+    if 'source' in df.columns:
+        df['source'] = df['source'].astype('category')
+    return df
+
+def _to_arrow(df, schema=None):
+    pa = _require_pyarrow()
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    # Use one dictionary index type whatever the number of categories, so chunks share a schema
+    fields = [
+        pa.field(f.name, pa.dictionary(pa.int32(), f.type.value_type))
+        if pa.types.is_dictionary(f.type) else f
+        for f in table.schema
+    ]
+    table = table.cast(pa.schema(fields))
+    if schema is not None:
+        table = table.cast(schema)
+    return table
+
+def write_output(df, path):
+    """Write an output file in the format given by its extension, replacing it atomically"""
+    df = compact_output(df)
+    # A temporary file of its own for every write, so concurrent writers of one path never share it
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', prefix=f"{os.path.basename(path)}.", suffix=".tmp")
+    os.close(fd)
+    try:
+        if path.endswith(OUTPUT_EXTENSIONS['parquet']):
+            import pyarrow.parquet as pq
+            pq.write_table(_to_arrow(df), temp_path)
+        else:
+            df.to_csv(temp_path, index=False)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+def output_columns(path):
+    """Column names of an output file, read without loading its rows"""
+    if path.endswith(OUTPUT_EXTENSIONS['parquet']):
+        _require_pyarrow()
+        import pyarrow.parquet as pq
+        return pq.read_schema(path).names
+    return list(pd.read_csv(path, nrows=0).columns)
+
+def read_output(path, columns=None):
+    """Read an output file, loading only the given columns (those that exist) if columns is set"""
+    if path.endswith(OUTPUT_EXTENSIONS['parquet']):
+        _require_pyarrow()
+        if columns is not None:
+            available = set(output_columns(path))
+            columns = [c for c in columns if c in available]
+        return pd.read_parquet(path, columns=columns)
+    if columns is not None:
+        wanted = set(columns)
+        return pd.read_csv(path, usecols=lambda c: c in wanted)
+    return pd.read_csv(path)
+
+def find_output(path):
+    """Return the path of an existing output in any format (the given one first), or None"""
+    if os.path.exists(path):
+        return path
+    stem, _ = os.path.splitext(path)
+    for extension in OUTPUT_EXTENSIONS.values():
+        if os.path.exists(stem + extension):
+            return stem + extension
+    return None
+
+class OutputWriter:
+    """Appends chunks of rows to one output file, in CSV or Parquet (by extension unless given)"""
+
+    def __init__(self, path, output_format=None):
+        self.path = path
+        if output_format is None:
+            output_format = 'parquet' if path.endswith(OUTPUT_EXTENSIONS['parquet']) else 'csv'
+        self.output_format = output_format
+        self._chunks_written = 0
+        self._parquet_writer = None
+
+    def write(self, df):
+        df = compact_output(df)
+        if self.output_format == 'parquet':
+            import pyarrow.parquet as pq
+            if self._parquet_writer is None:
+                table = _to_arrow(df)
+                self._parquet_writer = pq.ParquetWriter(self.path, table.schema)
+            else:
+                table = _to_arrow(df, schema=self._parquet_writer.schema_arrow)
+            self._parquet_writer.write_table(table)
+        else:
+            df.to_csv(self.path, mode='w' if self._chunks_written == 0 else 'a',
+                      header=self._chunks_written == 0, index=False)
+        self._chunks_written += 1
+
+    def close(self):
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+            self._parquet_writer = None
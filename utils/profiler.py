@@ -0,0 +1,173 @@
+import cProfile
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+
+class Profiler:
+    """Wall-clock timing spans for the pipeline's stages, with optional cProfile per stage.
+
+    Spans nest: each one is recorded under the path of the spans around it
+    (e.g. "translate;en-fr;http_request"). Spans opened in worker threads are
+    recorded under the stage the main thread is in at the time. When disabled,
+    span() costs one attribute check.
+
+    cProfile only sees the thread that started it, so per-stage profiles show
+    the main thread's work (pandas I/O, embedding, report export); time spent
+    in worker threads shows up in the spans instead.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.use_cprofile = False
+        self.started = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._main_stack = ()
+        self._spans = {}
+        self._profiles = {}
+        self._profiling = False
+
+    def start(self, use_cprofile=False):
+        self.enabled = True
+        self.use_cprofile = use_cprofile
+        self.started = time.perf_counter()
+
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            if threading.current_thread() is threading.main_thread():
+                stack = []
+            else:
+                # Worker threads hang their spans under the stage the main thread is in
+                stack = list(self._main_stack) + ["[worker]"]
+            self._local.stack = stack
+            self._local.base = len(stack)
+        return stack
+
+    @contextmanager
+    def span(self, name):
+        """Time a block as a named span nested in the current one"""
+        if not self.enabled:
+            yield
+            return
+        stack = self._stack()
+        is_main = threading.current_thread() is threading.main_thread()
+        if not is_main and len(stack) == self._local.base:
+            # Refresh the inherited prefix, as the main thread may have moved on to another stage
+            stack[:] = list(self._main_stack) + ["[worker]"]
+            self._local.base = len(stack)
+        stack.append(name)
+        path = ";".join(stack)
+        if is_main:
+            self._main_stack = tuple(stack)
+
+        profile = None
+        if self.use_cprofile and is_main:
+            with self._lock:
+                # Only one profiler can be active at a time, so nested stages are covered by their parent's
+                if not self._profiling:
+                    self._profiling = True
+                    profile = cProfile.Profile()
+        if profile is not None:
+            profile.enable()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            if profile is not None:
+                profile.disable()
+                with self._lock:
+                    self._profiling = False
+                    self._profiles.setdefault(path, []).append(profile)
+            with self._lock:
+                calls, total = self._spans.get(path, (0, 0.0))
+                self._spans[path] = (calls + 1, total + elapsed)
+            stack.pop()
+            if is_main:
+                self._main_stack = tuple(stack)
+
+    def summary_rows(self):
+        """(path, calls, total seconds, self seconds, share of the run's wall clock) per span"""
+        wall = time.perf_counter() - self.started if self.started else 0.0
+        with self._lock:
+            spans = dict(self._spans)
+        rows = []
+        for path, (calls, total) in spans.items():
+            depth = path.count(";")
+            children = sum(t for p, (_, t) in spans.items()
+                           if p.startswith(path + ";") and p.count(";") == depth + 1)
+            # Worker spans overlap, so a parent's self time can't go below zero
+            rows.append((path, calls, total, max(total - children, 0.0), total / wall if wall else 0.0))
+        return sorted(rows, key=lambda row: row[0])
+
+    def format_summary(self):
+        """A table of where the wall-clock time went, one line per span"""
+        wall = time.perf_counter() - self.started if self.started else 0.0
+        lines = [f"{'span':<60} {'calls':>7} {'total s':>10} {'self s':>10} {'% wall':>7}"]
+        for path, calls, total, self_time, share in self.summary_rows():
+            parts = path.split(";")
+            label = parts[-1]
+            if len(parts) > 1 and parts[-2] == "[worker]":
+                label = "[worker] " + label
+            label = "  " * (len([p for p in parts if p != "[worker]"]) - 1) + label
+            lines.append(f"{label:<60} {calls:>7} {total:>10.2f} {self_time:>10.2f} {share * 100:>6.1f}%")
+        lines.append(f"{'wall clock':<60} {'':>7} {wall:>10.2f}")
+        lines.append("Spans under [worker] run concurrently, so their totals can add up to more than the wall clock.")
+        return "\n".join(lines)
+
+    def collapsed_stacks(self):
+        """Span self-times in the collapsed-stack format read by flamegraph.pl and speedscope (microseconds)"""
+        lines = [f"{path} {int(self_time * 1e6)}"
+                 for path, _, _, self_time, _ in self.summary_rows() if self_time > 0]
+        return "\n".join(lines) + "\n"
+
+    def _merged_stats(self):
+        with self._lock:
+            profiles = dict(self._profiles)
+        for path, stage_profiles in profiles.items():
+            stats = pstats.Stats(stage_profiles[0])
+            for profile in stage_profiles[1:]:
+                stats.add(profile)
+            yield path, stats
+
+    def cprofile_stacks(self):
+        """Self-time of every function each profiled stage ran, in the same collapsed-stack format.
+
+        Kept apart from the span stacks, which already include this time.
+        """
+        lines = []
+        for path, stats in self._merged_stats():
+            for (filename, line, function), (_, _, tottime, _, _) in stats.stats.items():
+                if int(tottime * 1e6):
+                    frame = f"{os.path.basename(filename)}:{function}:{line}".replace(";", ",").replace(" ", "_")
+                    lines.append(f"{path};{frame} {int(tottime * 1e6)}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, output_dir):
+        """Write the summary table and collapsed stacks, plus cProfile stacks and .prof files per profiled stage"""
+        os.makedirs(output_dir, exist_ok=True)
+        summary = self.format_summary()
+        with open(os.path.join(output_dir, "summary.txt"), 'w', encoding='utf-8') as f:
+            f.write(summary + "\n")
+        with open(os.path.join(output_dir, "stacks.collapsed"), 'w', encoding='utf-8') as f:
+            f.write(self.collapsed_stacks())
+        if self._profiles:
+            with open(os.path.join(output_dir, "cprofile.collapsed"), 'w', encoding='utf-8') as f:
+                f.write(self.cprofile_stacks())
+        for path, stats in self._merged_stats():
+            stats.dump_stats(os.path.join(output_dir, path.replace(";", "__").replace("/", "_") + ".prof"))
+        print(summary)
+        print(f"Profile written to {output_dir}")
+
+_profiler = Profiler()
+
+def get_profiler():
+    """The process-wide profiler (disabled unless started)"""
+    return _profiler
+
+def span(name):
+    """Time a block as a span of the process-wide profiler"""
+    return _profiler.span(name)
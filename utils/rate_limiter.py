@@ -0,0 +1,98 @@
+import threading
+import time
+
+from config import load_config
+
+class TokenBucket:
+    """Token bucket that hands out request slots at a fixed requests-per-minute rate"""
+
+    def __init__(self, rpm, burst=1):
+        self.rpm = rpm
+        self.rate = rpm / 60.0  # tokens per second
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        # A threading lock (not an asyncio one) so a single bucket can be shared
+        # by several event loops running in different threads
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """Reserve the next token and return how many seconds to wait before using it"""
+        with self._lock:
+            self._refill()
+            # Tokens may go negative: each caller queues behind the previous reservations
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+    def _refill(self):
+        # Callers hold self._lock
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self):
+        """Take a token only if one is free right now; returns whether it did"""
+        return try_acquire_all([self])
+
+    def pause(self, seconds):
+        """Hand out no tokens for the next few seconds, e.g. after the provider asked us to back off"""
+        with self._lock:
+            self._refill()
+            # The next reservation then waits at least `seconds`; later ones queue behind it
+            self.tokens = min(self.tokens, 1 - seconds * self.rate)
+
+    def acquire(self):
+        """Block the current thread until a token is available"""
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+def try_acquire_all(buckets):
+    """Take a token from every bucket if each has one free right now, otherwise from none; returns whether it did"""
+    # Locks are always taken in the order get_request_buckets returns the buckets, so this can't deadlock
+    locked = []
+    try:
+        for bucket in buckets:
+            bucket._lock.acquire()
+            locked.append(bucket)
+            bucket._refill()
+        if any(bucket.tokens < 1 for bucket in buckets):
+            return False
+        for bucket in buckets:
+            bucket.tokens -= 1
+        return True
+    finally:
+        for bucket in locked:
+            bucket._lock.release()
+
+# Process-wide buckets, shared by every recipe that asks for the same name
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+def get_bucket(name, rpm, burst=1):
+    """Return the shared token bucket for a name, creating it on first use"""
+    with _buckets_lock:
+        bucket = _buckets.get(name)
+        if bucket is None:
+            bucket = TokenBucket(rpm, burst=burst)
+            _buckets[name] = bucket
+        return bucket
+
+def get_request_buckets(model_name, api_key_env=None, rpm=None):
+    """Return the buckets a request to a model must pass: per-model, plus per-API-key if configured.
+
+    The model's rate is its entry in [limits.models], else the rpm the recipe
+    asks for, else [limits] default_model_rpm.
+    """
+    limits = load_config().get('limits', {})
+
+    model_rpm = limits.get('models', {}).get(model_name) or rpm or limits.get('default_model_rpm', 38)
+    buckets = [get_bucket(f"model:{model_name}", model_rpm)]
+
+    key_rpm = limits.get('api_keys', {}).get(api_key_env) if api_key_env else None
+    if key_rpm:
+        buckets.append(get_bucket(f"api_key:{api_key_env}", key_rpm))
+
+    return buckets
@@ -0,0 +1,121 @@
+import importlib.util
+import inspect
+import os
+import threading
+from functools import partial
+
+from config import load_config
+from profiler import span
+
+def import_recipe_module(name, path):
+    """Execute a recipe file and return it as a module"""
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def build_engine_recipe(name, entry):
+    """Create a recipe served by the shared multi-model engine"""
+    from nvidia_recipe import NvidiaRecipe
+    return NvidiaRecipe.from_manifest(name, entry)
+
+# Engines that can serve a manifest entry without a recipe module of its own
+ENGINES = {
+    'nvidia': build_engine_recipe
+}
+
+ALL_MODES = ["translation_only", "similarity_only", "process_dataframe"]
+
+class LazyRecipe:
+    """Stand-in for a recipe that is only loaded when a stage actually uses it.
+
+    The manifest entry answers the cheap questions (which modes the recipe
+    supports, which models it uses) without executing the module, so menus,
+    reports and resets don't pay for torch, embedding models or API clients.
+    """
+
+    def __init__(self, name, loader, modes=None, model=None, similarity_model_name=None):
+        self.name = name
+        self.loader = loader
+        self.modes = modes
+        self.model = model
+        # Only set when declared, so an undeclared model falls through to the module
+        if similarity_model_name:
+            self.similarity_model_name = similarity_model_name
+        self._module = None
+        self._lock = threading.Lock()
+
+    @property
+    def module(self):
+        """The recipe module (or engine recipe), loaded on first access"""
+        with self._lock:
+            if self._module is None:
+                print(f"Loading recipe {self.name}...")
+                with span(f"load_recipe:{self.name}"):
+                    self._module = self.loader()
+            return self._module
+
+    def supports(self, mode):
+        """Whether the recipe provides a mode, e.g. 'translation_only'"""
+        if self.modes is not None:
+            return mode in self.modes
+        return hasattr(self.module, mode)
+
+    def __getattr__(self, attr):
+        # Called only for attributes not set above, i.e. the recipe's own functions
+        if attr.startswith('_'):
+            raise AttributeError(attr)
+        return getattr(self.module, attr)
+
+def supports_mode(recipe, mode):
+    """Whether a recipe (lazy or an imported module) provides a mode function"""
+    if isinstance(recipe, LazyRecipe):
+        return recipe.supports(mode)
+    return hasattr(recipe, mode)
+
+def accepts_journal(recipe, mode='translation_only'):
+    """Whether a recipe's mode function takes a row journal to resume from"""
+    try:
+        parameters = inspect.signature(getattr(recipe, mode)).parameters
+    except (AttributeError, TypeError, ValueError):
+        return False
+    return 'journal' in parameters or any(p.kind == p.VAR_KEYWORD for p in parameters.values())
+
+def discover_recipes(recipes_dir="recipes"):
+    """Build lazy recipes from the [recipes] manifest in pipeline.toml.
+
+    Entries with an engine are served by that shared engine; entries with a
+    module load that file from recipes_dir. Recipe files that aren't in the
+    manifest are still picked up, but their supported modes are only known
+    once they are imported.
+    """
+    manifest = load_config().get('recipes', {})
+    recipes = {}
+
+    for name, entry in manifest.items():
+        if 'engine' in entry:
+            if entry['engine'] not in ENGINES:
+                print(f"Recipe {name} uses unknown engine '{entry['engine']}'")
+                continue
+            loader = partial(ENGINES[entry['engine']], name, entry)
+            modes = entry.get('modes', ALL_MODES)
+        else:
+            path = os.path.join(recipes_dir, entry.get('module', f"{name}.py"))
+            if not os.path.exists(path):
+                print(f"Recipe {name} listed in the manifest but {path} was not found")
+                continue
+            loader = partial(import_recipe_module, name, path)
+            modes = entry.get('modes')
+        recipes[name] = LazyRecipe(
+            name, loader,
+            modes=modes,
+            model=entry.get('model'),
+            similarity_model_name=entry.get('similarity_model')
+        )
+
+    for file in sorted(os.listdir(recipes_dir)):
+        if file.endswith(".py") and file != "__init__.py" and file[:-3] not in recipes:
+            recipes[file[:-3]] = LazyRecipe(file[:-3], partial(import_recipe_module, file[:-3],
+                                                               os.path.join(recipes_dir, file)))
+
+    return recipes
@@ -9,14 +9,20 @@ import numpy as np
 from datetime import datetime
 import re
 
+from config import load_config
+from output_io import read_output
+from profiler import span
+
 pio.templates.default = "plotly_white"
 
 def get_available_recipes(recipes_dir="recipes"):
-    recipes = []
+    # Recipes declared in the pipeline.toml manifest, plus any recipe modules
+    recipes = list(load_config().get('recipes', {}))
     for file in os.listdir(recipes_dir):
-        if file.endswith(".py") and file != "__init__.py":
+        if file.endswith(".py") and file != "__init__.py" and file[:-3] not in recipes:
             recipes.append(file[:-3])
-    return recipes
+    # Longest names first, so a recipe whose name extends another's is matched first
+    return sorted(recipes, key=len, reverse=True)
 
 def extract_recipe_name_from_filename(filename, available_recipes):
     name_without_ext = os.path.splitext(filename)[0]
@@ -34,20 +40,23 @@ def collect_results(input_dir="output"):
 
     for root, _, files in os.walk(input_dir):
         for file in files:
-            if file.endswith(".csv"):
+            stem, ext = os.path.splitext(file)
+            # A Parquet output takes precedence over a CSV left from an earlier run
+            if ext == ".parquet" or (ext == ".csv" and f"{stem}.parquet" not in files):
                 folder_name = os.path.basename(root)
                 if '-' in folder_name:
                     source_lang, target_lang = folder_name.split('-', 1)
                     recipe_name = extract_recipe_name_from_filename(file, available_recipes)
                     try:
-                        df = pd.read_csv(os.path.join(root, file))
+                        # Only the columns the report uses are loaded
+                        df = read_output(os.path.join(root, file), columns=['similarity_score', 'source'])
                         if 'similarity_score' in df.columns:
                             avg_score = df['similarity_score'].mean()
                             results.setdefault(f"{source_lang}-{target_lang}", {})[recipe_name] = avg_score * 100
                             if 'source' in df.columns:
                                 source_breakdown.setdefault(f"{source_lang}-{target_lang}", {})
                                 source_breakdown[f"{source_lang}-{target_lang}"].setdefault(recipe_name, {})
-                                for source, group in df.groupby('source'):
+                                for source, group in df.groupby('source', observed=True):
                                     source_breakdown[f"{source_lang}-{target_lang}"][recipe_name][source] = \
                                         group['similarity_score'].mean() * 100
                     except Exception as e:
@@ -84,9 +93,12 @@ def create_horizontal_bar_chart(data, title, xlabel, filename, output_dir):
         height=max(400, len(labels) * 50 + 100)
     )
 
-    fig.write_html(os.path.join(output_dir, f"{filename}.html"))
-    fig.write_image(os.path.join(output_dir, f"{filename}.png"),
-                    width=1200, height=max(400, len(labels) * 50 + 100))
+    with span("write_html"):
+        fig.write_html(os.path.join(output_dir, f"{filename}.html"))
+    # Static export goes through kaleido, which is usually the slowest part of a report
+    with span("write_image"):
+        fig.write_image(os.path.join(output_dir, f"{filename}.png"),
+                        width=1200, height=max(400, len(labels) * 50 + 100))
     return fig
 
 def create_stacked_bar_chart(data_dict, title, xlabel, filename, output_dir):
@@ -125,9 +137,11 @@ def create_stacked_bar_chart(data_dict, title, xlabel, filename, output_dir):
         legend=dict(orientation="v", yanchor="top", y=1, xanchor="left", x=1.02)
     )
 
-    fig.write_html(os.path.join(output_dir, f"{filename}.html"))
-    fig.write_image(os.path.join(output_dir, f"{filename}.png"),
-                    width=1400, height=max(400, len(model_order) * 60 + 150))
+    with span("write_html"):
+        fig.write_html(os.path.join(output_dir, f"{filename}.html"))
+    with span("write_image"):
+        fig.write_image(os.path.join(output_dir, f"{filename}.png"),
+                        width=1400, height=max(400, len(model_order) * 60 + 150))
     return fig
 
 def generate_language_specific_reports(results, source_breakdown, output_dir="reports"):
@@ -317,17 +331,20 @@ def generate_report(input_dir="output", output_dir="reports"):
     os.makedirs(output_dir, exist_ok=True)
     
     # Collect results from all processed files
-    results, source_breakdown = collect_results(input_dir)
+    with span("collect_results"):
+        results, source_breakdown = collect_results(input_dir)
     
     if not results:
         print("No processed results found. Please run translations first.")
         return
     
     # Generate language-specific reports
-    generate_language_specific_reports(results, source_breakdown, output_dir)
+    with span("language_reports"):
+        generate_language_specific_reports(results, source_breakdown, output_dir)
     
     # Generate overall summary
-    overall_summary = generate_overall_summary(results, source_breakdown, output_dir)
+    with span("overall_summary"):
+        overall_summary = generate_overall_summary(results, source_breakdown, output_dir)
     
     print(f"Reports generated successfully in {output_dir}/")
     print("Both interactive HTML charts and static PNG images have been created!")
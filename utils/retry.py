@@ -0,0 +1,89 @@
+import random
+import time
+from email.utils import parsedate_to_datetime
+
+from config import load_config
+
+# Statuses worth retrying: timeouts, conflicts, throttling and every server error
+RETRYABLE_STATUSES = {408, 409, 425, 429}
+
+def status_code(error):
+    """HTTP status of an API error, or None for network errors, timeouts and malformed responses"""
+    status = getattr(error, 'status_code', None)
+    if status is None:
+        status = getattr(getattr(error, 'response', None), 'status_code', None)
+    return status
+
+def retry_after_seconds(error):
+    """Seconds the server asked us to wait (Retry-After or retry-after-ms), or None"""
+    headers = getattr(getattr(error, 'response', None), 'headers', None)
+    if not headers:
+        return None
+    value = headers.get('retry-after-ms')
+    if value is not None:
+        try:
+            return max(float(value) / 1000.0, 0.0)
+        except ValueError:
+            pass
+    value = headers.get('retry-after')
+    if value is None:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    # Retry-After may also be an HTTP date
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+class RetryPolicy:
+    """Decides whether and when a failed request is retried.
+
+    Throttling and server errors are retried after the delay the server asks
+    for (Retry-After), or else after an exponential backoff with full jitter,
+    so that many workers hitting the same limit don't retry in lockstep.
+    Client errors such as 400 or 401 fail at once, since repeating the same
+    request can't succeed.
+    """
+
+    def __init__(self, max_attempts=5, base_delay=1.0, max_delay=60.0, max_retry_after=300.0):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after
+
+    def is_retryable(self, error):
+        status = status_code(error)
+        if status is None:
+            return True
+        return status in RETRYABLE_STATUSES or status >= 500
+
+    def backoff(self, attempt):
+        """Full-jitter delay before retry number attempt (0 for the first retry)"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def delay(self, attempt, error, max_attempts=None):
+        """Seconds to wait before retrying after attempt (0-based) failed with error, or None to give up"""
+        if attempt + 1 >= (max_attempts or self.max_attempts) or not self.is_retryable(error):
+            return None
+        retry_after = retry_after_seconds(error)
+        if retry_after is not None:
+            return min(retry_after, self.max_retry_after)
+        return self.backoff(attempt)
+
+_policy = None
+
+def get_retry_policy():
+    """The retry policy shared by every recipe, from [retry] in pipeline.toml"""
+    global _policy
+    if _policy is None:
+        settings = load_config().get('retry', {})
+        _policy = RetryPolicy(
+            max_attempts=settings.get('max_attempts', 5),
+            base_delay=settings.get('base_delay_seconds', 1.0),
+            max_delay=settings.get('max_delay_seconds', 60.0),
+            max_retry_after=settings.get('max_retry_after_seconds', 300.0)
+        )
+    return _policy
@@ -0,0 +1,94 @@
+import glob
+import hashlib
+import json
+import os
+
+def row_hash(index, text):
+    """Stable key for a row: its position in the input file plus its source text"""
+    return hashlib.sha1(f"{index}\x1f{text}".encode('utf-8')).hexdigest()
+
+class RowJournal:
+    """Append-only JSONL journal of the rows a recipe has finished translating.
+
+    One line is appended (and flushed to disk) as each row completes, so an
+    interrupted run can pick up where it stopped instead of starting over.
+
+    Several writers (e.g. shards covering different row ranges) each append to
+    their own segment file next to the journal; reading always merges the
+    journal with all of its segments.
+
+    A sequential journal is filled chunk after chunk in input order (as when
+    streaming), so once a chunk finds none of its rows journaled, no later
+    chunk can have any either and load() stops reading the files.
+    """
+
+    def __init__(self, path, segment=None, sequential=False):
+        self.path = path
+        self.segment = segment
+        self.sequential = sequential
+        self._past_resume_point = False
+        self._file = None
+
+    @property
+    def write_path(self):
+        """File this journal appends to: the journal itself or one of its segments"""
+        if self.segment is None:
+            return self.path
+        stem, ext = os.path.splitext(self.path)
+        return f"{stem}.segment-{self.segment}{ext}"
+
+    def _all_paths(self):
+        stem, ext = os.path.splitext(self.path)
+        segments = glob.glob(f"{glob.escape(stem)}.segment-*{ext}")
+        return [p for p in [self.path] + sorted(segments) if os.path.exists(p)]
+
+    def load(self, include_failed=False, keys=None):
+        """Return {row_hash: translation} for every row recorded so far (only those in keys, if given).
+
+        Rows that failed are left out (so they are retried) unless
+        include_failed is set, in which case they map to an empty string.
+        """
+        if self._past_resume_point:
+            return {}
+        completed = {}
+        for path in self._all_paths():
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A crash can leave a half-written last line; ignore it
+                        continue
+                    if keys is not None and entry['row'] not in keys:
+                        continue
+                    if entry['translated'] or include_failed:
+                        # A later success overrides an earlier failure of the same row
+                        if entry['translated'] or entry['row'] not in completed:
+                            completed[entry['row']] = entry['translated']
+        if self.sequential and keys is not None and not completed:
+            self._past_resume_point = True
+        return completed
+
+    def append(self, key, translation):
+        """Record one finished row (an empty translation records a failed attempt)"""
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            self._file = open(self.write_path, 'a', encoding='utf-8')
+        self._file.write(json.dumps({'row': key, 'translated': translation}, ensure_ascii=False) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def remove(self):
+        """Delete the journal and its segments once the rows are safely in the output file"""
+        self.close()
+        for path in self._all_paths():
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                # Another shard finalising the same output got there first
+                pass
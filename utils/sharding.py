@@ -0,0 +1,37 @@
+import hashlib
+from collections import namedtuple
+
+# One block of rows of a language-pair file to translate with one recipe
+TranslationUnit = namedtuple(
+    'TranslationUnit', ['file', 'source_lang', 'target_lang', 'recipe_name', 'start', 'end']
+)
+
+def unit_id(unit):
+    """Stable identifier for a work unit, the same in every process and on every machine"""
+    return f"{unit.source_lang}-{unit.target_lang}/{unit.file}/{unit.recipe_name}/{unit.start}-{unit.end}"
+
+def parse_shard(value):
+    """Parse 'i/N' into (i, N), with shards numbered from 0 to N-1"""
+    try:
+        index, count = (int(part) for part in value.split('/'))
+    except ValueError:
+        raise ValueError(f"Invalid shard '{value}': expected the form i/N, e.g. 0/4")
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"Invalid shard '{value}': i must be between 0 and N-1")
+    return index, count
+
+def in_shard(key, shard):
+    """Whether a work item belongs to a shard (None means a single shard doing all the work).
+
+    Items are assigned by a hash of their key, so every process splits the same
+    work the same way without talking to the others.
+    """
+    if shard is None:
+        return True
+    index, count = shard
+    digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+    return int(digest, 16) % count == index
+
+def row_ranges(total_rows, chunk_size):
+    """Split range(total_rows) into consecutive (start, end) blocks of at most chunk_size rows"""
+    return [(start, min(start + chunk_size, total_rows)) for start in range(0, total_rows, chunk_size)]
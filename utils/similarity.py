@@ -0,0 +1,72 @@
+import hashlib
+
+import numpy as np
+
+def encode_texts(model, texts, batch_size=32):
+    """Encode texts into L2-normalised embeddings, so a dot product is the cosine similarity"""
+    return model.encode(texts, batch_size=batch_size, convert_to_numpy=True,
+                        normalize_embeddings=True, show_progress_bar=False)
+
+def translated_hashes(df):
+    """Hash of each row's translation, stored next to its score to tell when it goes stale"""
+    return [hashlib.sha1(text.encode('utf-8')).hexdigest()
+            for text in df['translated'].fillna('').astype(str)]
+
+def stale_rows(df):
+    """Boolean mask of the rows that have no score or whose translation changed since it was scored"""
+    if 'similarity_score' not in df.columns or 'translated_hash' not in df.columns:
+        return np.ones(len(df), dtype=bool)
+    changed = df['translated_hash'].astype(str).to_numpy() != np.array(translated_hashes(df), dtype=object)
+    return df['similarity_score'].isna().to_numpy() | changed
+
+def score_outputs(model, ref_texts, outputs, batch_size=32):
+    """Score several recipes' outputs for one language pair, encoding only the rows that need it.
+
+    outputs is a list of DataFrames with 'translated' and 'ref' columns. Each
+    one is updated in place: rows without a score, or whose translation no
+    longer matches the stored translated_hash, get a new similarity_score and
+    hash; the other rows keep theirs. The references of those rows are
+    encoded once for all outputs and the translations together in one
+    batched pass. Returns the number of rows scored per output.
+    """
+    masks = [stale_rows(df) for df in outputs]
+
+    # Rows whose output lines up with the input share one encoding of the references
+    aligned = [df['ref'].fillna('').astype(str).tolist() == ref_texts for df in outputs]
+    ref_positions = sorted(set().union(*[np.flatnonzero(mask) for mask, a in zip(masks, aligned) if a]))
+    ref_embeddings = {}
+    if ref_positions:
+        print(f"Encoding {len(ref_positions)} references once for {sum(aligned)} recipes...")
+        encoded = encode_texts(model, [ref_texts[i] for i in ref_positions], batch_size)
+        ref_embeddings = dict(zip(ref_positions, encoded))
+
+    translated_texts = [df['translated'].fillna('').astype(str).to_numpy()[mask].tolist()
+                        for df, mask in zip(outputs, masks)]
+    all_translated = [text for texts in translated_texts for text in texts]
+    if all_translated:
+        print(f"Encoding {len(all_translated)} translations in one batched pass...")
+        translated_embeddings = encode_texts(model, all_translated, batch_size)
+
+    scored = []
+    offset = 0
+    for df, mask, texts, is_aligned in zip(outputs, masks, translated_texts, aligned):
+        positions = np.flatnonzero(mask)
+        scored.append(len(positions))
+        if not len(positions):
+            continue
+        embeddings = translated_embeddings[offset:offset + len(texts)]
+        offset += len(texts)
+
+        if is_aligned:
+            refs = np.stack([ref_embeddings[i] for i in positions])
+        else:
+            print("References in output differ from the input file; encoding them separately")
+            output_refs = df['ref'].fillna('').astype(str).to_numpy()[mask].tolist()
+            refs = encode_texts(model, output_refs, batch_size)
+
+        scores = df['similarity_score'].to_numpy(dtype='float32', copy=True) \
+            if 'similarity_score' in df.columns else np.full(len(df), np.nan, dtype='float32')
+        scores[positions] = np.sum(embeddings * refs, axis=1)
+        df['similarity_score'] = scores
+        df['translated_hash'] = translated_hashes(df)
+    return scored
@@ -0,0 +1,97 @@
+import json
+import os
+import sqlite3
+import threading
+
+class StateStore:
+    """Processing state kept in SQLite (WAL mode), one row per state key and flag.
+
+    Each flag is upserted in its own small transaction instead of rewriting the
+    whole state, and WAL mode lets several threads or processes read and write
+    the same database at once.
+    """
+
+    def __init__(self, path="processing_state.db"):
+        self.path = path
+        # sqlite3 connections can't be shared between threads, so keep one per thread
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS state ("
+                " key TEXT NOT NULL,"
+                " field TEXT NOT NULL,"
+                " value TEXT NOT NULL,"
+                " PRIMARY KEY (key, field))"
+            )
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key, default=None):
+        """Return the flags stored for a key as a dict, or default if there are none"""
+        rows = self._connect().execute("SELECT field, value FROM state WHERE key = ?", (key,)).fetchall()
+        if not rows:
+            return default
+        return {field: json.loads(value) for field, value in rows}
+
+    def update(self, key, **flags):
+        """Upsert one or more flags for a key in a single transaction"""
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT INTO state (key, field, value) VALUES (?, ?, ?) "
+                "ON CONFLICT (key, field) DO UPDATE SET value = excluded.value",
+                [(key, field, json.dumps(value)) for field, value in flags.items()]
+            )
+
+    def items(self):
+        """Return (key, flags) pairs for every key in the store"""
+        state = {}
+        for key, field, value in self._connect().execute("SELECT key, field, value FROM state ORDER BY key"):
+            state.setdefault(key, {})[field] = json.loads(value)
+        return list(state.items())
+
+    def delete(self, key):
+        """Remove every flag stored for a key"""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM state WHERE key = ?", (key,))
+
+    def clear(self):
+        """Remove every key from the store"""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM state")
+
+    def __len__(self):
+        return self._connect().execute("SELECT COUNT(DISTINCT key) FROM state").fetchone()[0]
+
+    def __contains__(self, key):
+        return self._connect().execute("SELECT 1 FROM state WHERE key = ? LIMIT 1", (key,)).fetchone() is not None
+
+    def migrate_from_json(self, json_file):
+        """Import a legacy processing_state.json, then rename it so it isn't imported twice.
+
+        A file that can't be parsed is left untouched and reported instead of
+        being treated as empty state.
+        """
+        try:
+            with open(json_file, 'r') as f:
+                legacy_state = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Could not migrate {json_file}: {str(e)}")
+            return 0
+
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT INTO state (key, field, value) VALUES (?, ?, ?) "
+                "ON CONFLICT (key, field) DO UPDATE SET value = excluded.value",
+                [(key, field, json.dumps(value))
+                 for key, flags in legacy_state.items() for field, value in flags.items()]
+            )
+        os.replace(json_file, json_file + ".migrated")
+        print(f"Migrated {len(legacy_state)} entries from {json_file}")
+        return len(legacy_state)
@@ -0,0 +1,104 @@
+import json
+import math
+import os
+
+from config import load_config
+
+DEFAULT_CALIBRATION_PATH = os.path.join("cache", "token_budget.json")
+
+class TokenBudget:
+    """Per-request max_tokens sized from the source text instead of one fixed ceiling.
+
+    The expected output length is the source length times the language pair's
+    output/input length ratio (calibrated from earlier outputs, or a
+    conservative default), converted to tokens and padded with a safety
+    margin. Requests that still get cut off are retried with a larger budget
+    by the engine, up to the recipe's own max_tokens.
+    """
+
+    def __init__(self, ratios=None, default_ratio=2.0, chars_per_token=3.0, margin=1.5,
+                 min_tokens=64, tokens_per_sentence=8):
+        self.ratios = ratios or {}
+        self.default_ratio = default_ratio
+        self.chars_per_token = chars_per_token
+        self.margin = margin
+        self.min_tokens = min_tokens
+        # Brackets, numbering and the end-of-answer token of each sentence
+        self.tokens_per_sentence = tokens_per_sentence
+
+    def max_tokens_for(self, pair, texts, ceiling, overhead_tokens=0):
+        """max_tokens for translating texts of a language pair, between min_tokens and ceiling"""
+        chars = sum(len(str(text)) for text in texts)
+        ratio = self.ratios.get(pair, self.default_ratio)
+        estimate = (chars * ratio / self.chars_per_token * self.margin
+                    + self.tokens_per_sentence * len(texts) + overhead_tokens)
+        return int(min(ceiling, max(self.min_tokens, math.ceil(estimate))))
+
+def calibrate(output_dir="output", path=None, quantile=0.95, min_chars=20):
+    """Measure each language pair's output/input length ratio from the translated files in output_dir.
+
+    The ratio kept per pair is a high quantile of the per-row ratios, so most
+    rows fit their budget the first time; very short sources, whose ratios
+    are noisy, are left out. The result is written to path as JSON.
+    """
+    import numpy as np
+    from output_io import OUTPUT_EXTENSIONS, read_output
+
+    path = path or load_config().get('token_budget', {}).get('calibration_path', DEFAULT_CALIBRATION_PATH)
+    pair_ratios = {}
+    for root, _, files in os.walk(output_dir):
+        pair = os.path.basename(root)
+        if '-' not in pair:
+            continue
+        for file in files:
+            if os.path.splitext(file)[1] not in OUTPUT_EXTENSIONS.values():
+                continue
+            try:
+                df = read_output(os.path.join(root, file), columns=['text', 'translated'])
+            except Exception as e:
+                print(f"Skipping {file}: {str(e)}")
+                continue
+            if not {'text', 'translated'} <= set(df.columns):
+                continue
+            source_chars = df['text'].fillna('').astype(str).str.len().to_numpy()
+            output_chars = df['translated'].fillna('').astype(str).str.len().to_numpy()
+            usable = (source_chars >= min_chars) & (output_chars > 0)
+            pair_ratios.setdefault(pair, []).append(output_chars[usable] / source_chars[usable])
+
+    calibration = {'quantile': quantile, 'pairs': {}}
+    for pair, ratios in sorted(pair_ratios.items()):
+        ratios = np.concatenate(ratios)
+        if len(ratios):
+            calibration['pairs'][pair] = {'ratio': round(float(np.quantile(ratios, quantile)), 3), 'rows': int(len(ratios))}
+            print(f"{pair}: output/input length ratio {calibration['pairs'][pair]['ratio']} (p{int(quantile * 100)} of {len(ratios)} rows)")
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(calibration, f, indent=2)
+    print(f"Token budget calibration written to {path}")
+    return calibration
+
+_budget = None
+
+def get_token_budget():
+    """The shared token budget from [token_budget] and its calibration file, or None if disabled"""
+    global _budget
+    settings = load_config().get('token_budget', {})
+    if not settings.get('enabled', False):
+        return None
+    if _budget is None:
+        ratios = {}
+        path = settings.get('calibration_path', DEFAULT_CALIBRATION_PATH)
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                ratios = {pair: entry['ratio'] for pair, entry in json.load(f).get('pairs', {}).items()}
+        else:
+            print(f"No token budget calibration at {path}; using the default ratio (run `main.py calibrate`)")
+        _budget = TokenBudget(
+            ratios=ratios,
+            default_ratio=settings.get('default_ratio', 2.0),
+            chars_per_token=settings.get('chars_per_token', 3.0),
+            margin=settings.get('margin', 1.5),
+            min_tokens=settings.get('min_tokens', 64)
+        )
+    return _budget
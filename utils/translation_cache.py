@@ -0,0 +1,133 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from config import load_config
+
+class TranslationCache:
+    """On-disk cache of model responses, keyed by a hash of everything that shapes the response.
+
+    Entries are evicted least-recently-used first once the cache holds more
+    than max_entries responses. Hits and misses are counted for reporting.
+    """
+
+    # How many inserts to allow between checks of the cache size
+    EVICTION_CHECK_INTERVAL = 100
+
+    def __init__(self, path="cache/translations.db", max_entries=500000):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._puts = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY,"
+                " response TEXT NOT NULL,"
+                " last_used REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+        self._evict()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def make_key(model, prompt, temperature, top_p, max_tokens, **extra_params):
+        """Content address for a request: model, prompt and every sampling parameter"""
+        request = {
+            'model': model,
+            'prompt': prompt,
+            'temperature': temperature,
+            'top_p': top_p,
+            'max_tokens': max_tokens,
+            **extra_params
+        }
+        return hashlib.sha256(json.dumps(request, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """Return the cached response for a key, or None on a miss"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+        with self._lock:
+            if row is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return row[0] if row is not None else None
+
+    def put(self, key, response):
+        """Store a response, evicting the least recently used entries if the cache is full"""
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO responses (key, response, last_used) VALUES (?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET response = excluded.response, last_used = excluded.last_used",
+                (key, response, time.time())
+            )
+        with self._lock:
+            self._puts += 1
+            check_size = self._puts % self.EVICTION_CHECK_INTERVAL == 0
+        if check_size:
+            self._evict()
+
+    def _evict(self):
+        with self._connect() as conn:
+            count = conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            if count > self.max_entries:
+                conn.execute(
+                    "DELETE FROM responses WHERE key IN "
+                    "(SELECT key FROM responses ORDER BY last_used LIMIT ?)",
+                    (count - self.max_entries,)
+                )
+
+    def stats(self):
+        """Return hit/miss counters and the current number of cached responses"""
+        entries = self._connect().execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'entries': entries
+            }
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_translation_cache():
+    """Return the process-wide translation cache, or None if it is disabled in pipeline.toml"""
+    global _cache
+    settings = load_config().get('cache', {})
+    if not settings.get('enabled', True):
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = TranslationCache(
+                settings.get('path', os.path.join('cache', 'translations.db')),
+                max_entries=settings.get('max_entries', 500000)
+            )
+        return _cache
+
+def print_cache_stats():
+    """Print the hit/miss counters of the translation cache if it was used"""
+    if _cache is None:
+        return
+    stats = _cache.stats()
+    print(f"Translation cache: {stats['hits']} hits, {stats['misses']} misses "
+          f"({stats['hit_rate']:.1%} hit rate), {stats['entries']} cached responses")
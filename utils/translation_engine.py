@@ -0,0 +1,102 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from row_journal import row_hash
+
+def translate_texts(texts, translate_fn, max_concurrency=8, on_result=None, label=None,
+                    batch_fn=None, batch_size=1):
+    """Translate texts concurrently, keeping up to max_concurrency requests in flight.
+
+    translate_fn is the recipe's blocking single-text translator; it runs in a
+    thread pool and waits on the shared token buckets itself just before each
+    API call, so request latency overlaps with the rate-limit wait instead of
+    adding to it, while cache hits don't use up a request slot.
+    If batch_fn is given with a batch_size above 1, texts are instead handed
+    to it batch_size at a time and it returns one translation per text.
+    Results are returned in the same order as texts. label prefixes the progress
+    lines so concurrent recipes can be told apart.
+    """
+    if batch_fn is None:
+        batch_size = 1
+    return asyncio.run(_translate_all(list(texts), translate_fn, max_concurrency, on_result, label,
+                                      batch_fn, max(batch_size, 1)))
+
+async def _translate_all(texts, translate_fn, max_concurrency, on_result, label, batch_fn=None, batch_size=1):
+    prefix = f"[{label}] " if label else ""
+    total_texts = len(texts)
+    results = [""] * total_texts
+    if not total_texts:
+        return results
+
+    queue = asyncio.Queue()
+    for start in range(0, total_texts, batch_size):
+        queue.put_nowait(list(range(start, min(start + batch_size, total_texts))))
+
+    loop = asyncio.get_running_loop()
+    workers = min(max_concurrency, queue.qsize())
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+
+        async def worker():
+            while True:
+                try:
+                    batch = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+
+                if len(batch) == 1:
+                    i = batch[0]
+                    print(f"{prefix}Translating {i+1}/{total_texts}: {str(texts[i])[:50]}...")
+                    translations = [await loop.run_in_executor(executor, translate_fn, texts[i])]
+                else:
+                    print(f"{prefix}Translating {batch[0]+1}-{batch[-1]+1}/{total_texts} in one request: {str(texts[batch[0]])[:50]}...")
+                    translations = await loop.run_in_executor(executor, batch_fn, [texts[i] for i in batch])
+
+                for i, translation in zip(batch, translations):
+                    results[i] = translation
+
+                    # Show translation result
+                    if translation:
+                        print(f"{prefix}  → {translation[:50]}...")
+                    else:
+                        print(f"{prefix}  → [Translation failed]")
+
+                    if on_result is not None:
+                        on_result(i, translation)
+
+        await asyncio.gather(*(worker() for _ in range(workers)))
+
+    return results
+
+def translate_rows(df, translate_fn, max_concurrency=8, label=None, journal=None, batch_fn=None, batch_size=1):
+    """Translate df['text'], skipping rows already in the journal and journaling each new row.
+
+    Returns the translations aligned with the rows of df. Failed (empty)
+    translations are journaled as failures: they count as attempted, but are
+    retried on the next run. A translate_fn result of None means the row
+    wasn't attempted at all; it isn't journaled and is returned as None.
+    """
+    texts = df['text'].tolist()
+    keys = [row_hash(index, text) for index, text in zip(df.index, texts)]
+    # Only this df's rows are kept, so memory follows the chunk size rather than the journal's
+    completed = journal.load(keys=set(keys)) if journal is not None else {}
+
+    translations = [completed.get(key, "") for key in keys]
+    pending = [i for i, key in enumerate(keys) if key not in completed]
+    if len(pending) < len(keys):
+        print(f"Resuming from journal: {len(keys) - len(pending)}/{len(keys)} rows already translated")
+
+    def on_result(i, translation):
+        if journal is not None and translation is not None:
+            journal.append(keys[pending[i]], translation)
+
+    try:
+        results = translate_texts([texts[i] for i in pending], translate_fn,
+                                  max_concurrency=max_concurrency, on_result=on_result, label=label,
+                                  batch_fn=batch_fn, batch_size=batch_size)
+    finally:
+        if journal is not None:
+            journal.close()
+
+    for i, translation in zip(pending, results):
+        translations[i] = translation
+    return translations
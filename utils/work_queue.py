@@ -0,0 +1,162 @@
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+def default_worker_id():
+    """Identifier for this worker: host name plus process id"""
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+class WorkQueue:
+    """Lease-based task queue in a SQLite file that any number of workers can share.
+
+    A worker claims a pending task by taking a lease on it and keeps the lease
+    alive with heartbeats while it works. If a worker crashes, its lease
+    expires and the task is handed to the next worker that asks for one.
+    """
+
+    def __init__(self, path, lease_seconds=300):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS tasks ("
+                " task_id TEXT PRIMARY KEY,"
+                " status TEXT NOT NULL DEFAULT 'pending',"
+                " owner TEXT,"
+                " lease_expires REAL,"
+                " heartbeat REAL,"
+                " attempts INTEGER NOT NULL DEFAULT 0)"
+            )
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # Autocommit mode, so claim() can take the write lock with BEGIN IMMEDIATE
+            conn = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+            # The rollback journal, not WAL: WAL needs every connection on one host, and workers may
+            # share the queue over a network filesystem
+            conn.execute("PRAGMA journal_mode=DELETE")
+            self._local.conn = conn
+        return conn
+
+    def enqueue(self, task_ids):
+        """Add tasks that aren't in the queue yet; existing tasks keep their status"""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany("INSERT OR IGNORE INTO tasks (task_id) VALUES (?)", [(t,) for t in task_ids])
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def claim(self, worker_id, task_ids=None):
+        """Lease the next pending (or expired) task to a worker and return its id, or None.
+
+        task_ids optionally restricts the claim to tasks this worker knows how
+        to run (e.g. the pairs and recipes it was started with).
+        """
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute(
+                "SELECT task_id FROM tasks WHERE status = 'pending' "
+                "OR (status = 'leased' AND lease_expires < ?) ORDER BY rowid",
+                (now,)
+            )
+            task_id = None
+            for (candidate,) in rows:
+                if task_ids is None or candidate in task_ids:
+                    task_id = candidate
+                    break
+            if task_id is not None:
+                conn.execute(
+                    "UPDATE tasks SET status = 'leased', owner = ?, lease_expires = ?, heartbeat = ?, "
+                    "attempts = attempts + 1 WHERE task_id = ?",
+                    (worker_id, now + self.lease_seconds, now, task_id)
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return task_id
+
+    def heartbeat(self, task_id, worker_id):
+        """Extend a lease; returns False if the worker no longer holds it"""
+        now = time.time()
+        cursor = self._connect().execute(
+            "UPDATE tasks SET lease_expires = ?, heartbeat = ? "
+            "WHERE task_id = ? AND owner = ? AND status = 'leased'",
+            (now + self.lease_seconds, now, task_id, worker_id)
+        )
+        return cursor.rowcount == 1
+
+    def complete(self, task_id, worker_id):
+        """Mark a task as done"""
+        self._connect().execute(
+            "UPDATE tasks SET status = 'done', lease_expires = NULL WHERE task_id = ? AND owner = ?",
+            (task_id, worker_id)
+        )
+
+    def release(self, task_id, worker_id):
+        """Give a task back to the queue, e.g. after it failed"""
+        self._connect().execute(
+            "UPDATE tasks SET status = 'pending', owner = NULL, lease_expires = NULL "
+            "WHERE task_id = ? AND owner = ?",
+            (task_id, worker_id)
+        )
+
+    def remove(self, matches=None):
+        """Delete the tasks whose id matches(task_id) is true (every task by default); returns how many"""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            task_ids = [t for (t,) in conn.execute("SELECT task_id FROM tasks") if matches is None or matches(t)]
+            conn.executemany("DELETE FROM tasks WHERE task_id = ?", [(t,) for t in task_ids])
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return len(task_ids)
+
+    def counts(self):
+        """Number of tasks per status, counting expired leases as pending"""
+        counts = {'pending': 0, 'leased': 0, 'done': 0}
+        rows = self._connect().execute(
+            "SELECT CASE WHEN status = 'leased' AND lease_expires < ? THEN 'pending' ELSE status END, COUNT(*) "
+            "FROM tasks GROUP BY 1",
+            (time.time(),)
+        )
+        for status, count in rows:
+            counts[status] = count
+        return counts
+
+class Heartbeat:
+    """Context manager that renews a task's lease in the background while the task runs"""
+
+    def __init__(self, queue, task_id, worker_id, interval):
+        self.queue = queue
+        self.task_id = task_id
+        self.worker_id = worker_id
+        self.interval = interval
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            if not self.queue.heartbeat(self.task_id, self.worker_id):
+                print(f"Lost the lease on {self.task_id}")
+                return
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stopped.set()
+        self._thread.join()